@@ -1,4 +1,7 @@
 import streamlit as st
+from assessment import get_warm_start_cache
+from perf import timed_rerun
+from session_store import persisted_session
 from shared_utils import init_session_state, render_sidebar
 
 
@@ -12,6 +15,9 @@ def main():
     init_session_state()
     render_sidebar()
 
+    # Start fetching the first assessment replies while the user reads the intro
+    get_warm_start_cache(st.secrets["groq"]["api_key"])
+
     col1, col2 = st.columns([1, 4])
     col1.image("images/tt-logo.png")
     col2.title("Welcome to Talent Tracing!")
@@ -32,4 +38,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    with timed_rerun("Home"), persisted_session():
+        main()
@@ -0,0 +1,119 @@
+# aiks_profile.py
+import re
+from collections.abc import Mapping
+from difflib import SequenceMatcher
+
+from shared_utils import AIKS_CATEGORIES
+
+STOP_WORDS = {"a", "an", "and", "the", "of", "or", "to", "in", "on", "for", "with"}
+
+
+def canonicalize(item: str) -> str:
+    """Canonical form of an AIKS item: lowercase words without punctuation"""
+    return " ".join(re.findall(r"[\w+#]+", item.casefold()))
+
+
+def canonical_profile(aiks_data: Mapping) -> dict:
+    """Order-independent form of an AIKS profile, e.g. for cache keys"""
+    return {
+        category: sorted({canonicalize(item) for item in items} - {""})
+        for category, items in sorted(aiks_data.items())
+    }
+
+
+def item_tokens(key: str) -> frozenset:
+    """Content words of a canonical item, with a naive plural strip"""
+    return frozenset(
+        word[:-1] if len(word) > 3 and word.endswith("s") else word
+        for word in key.split()
+        if word not in STOP_WORDS
+    )
+
+
+def is_near_duplicate(key: str, tokens: frozenset, other_key: str) -> bool:
+    """Items match if they have the same words, or they differ by a typo.
+
+    A typo is one word spelled differently, a different word is a different
+    item ("Interested in biology", "Interested in zoology"). An item
+    containing another one's words is more specific ("Web design", "Design"),
+    so both are kept.
+    """
+    other_tokens = item_tokens(other_key)
+    if tokens == other_tokens:
+        return bool(tokens)
+    changed, other_changed = tokens - other_tokens, other_tokens - tokens
+    if len(changed) != 1 or len(other_changed) != 1:
+        return False
+    (word,), (other_word,) = changed, other_changed
+    return SequenceMatcher(None, word, other_word).ratio() >= 0.9
+
+
+class AIKSProfile(Mapping):
+    """AIKS items per category in insertion order, without near-duplicates.
+
+    Reads like the old dict of lists (profile["skills"], profile.items()), so
+    it can be rendered and put into prompts as before. Items are stored by
+    canonical key, so "Drawing", "drawing " and "Drawings" are kept once.
+    Each category keeps at most max_items, dropping the oldest.
+
+    >>> profile = AIKSProfile()
+    >>> profile.add("interests", ["Interested in biology", "Interested in zoology"])
+    2
+    >>> profile.add(
+    ...     "interests", ["Interest in marine biology", "Interest in marine ecology"]
+    ... )
+    2
+    >>> profile.add("skills", ["Programming", "programing", "Web design", "Design"])
+    3
+    """
+
+    def __init__(self, max_items: int = 20, data: dict = None):
+        self.max_items = max_items
+        self._items: dict[str, dict[str, str]] = {
+            category: {} for category in AIKS_CATEGORIES
+        }
+        for category, items in (data or {}).items():
+            self.add(category, items)
+
+    def __getitem__(self, category: str) -> list[str]:
+        return list(self._items[category].values())
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def has(self, category: str, item: str) -> bool:
+        return canonicalize(item) in self._items[category]
+
+    def add(self, category: str, items: list[str]) -> int:
+        """Add items to a category, returns how many were actually new"""
+        stored = self._items[category]
+        added = 0
+        for item in items:
+            key = canonicalize(item)
+            if not key or key in stored:
+                continue
+
+            tokens = item_tokens(key)
+            if any(is_near_duplicate(key, tokens, other) for other in stored):
+                continue
+
+            stored[key] = " ".join(item.split())
+            added += 1
+
+            if len(stored) > self.max_items:
+                del stored[next(iter(stored))]
+        return added
+
+    def merge(self, updates: dict) -> int:
+        """Add items from an AIKS update, ignoring unknown categories"""
+        return sum(
+            self.add(category, items)
+            for category, items in updates.items()
+            if category in self._items
+        )
+
+    def to_dict(self) -> dict:
+        return {category: self[category] for category in self._items}
@@ -0,0 +1,160 @@
+# assessment.py
+import threading
+import time
+
+import streamlit as st
+
+from chat_memory import ChatMessage
+from context_engine import new_conversation_context
+from llm_client import get_llm_client
+from llm_gateway import background, get_llm_gateway
+from models import AssessmentResponse
+from shared_utils import AIKS_CATEGORIES, DEFAULT_MODEL, get_settings
+
+# Defaults for the first-turn warm start, override them in the [warm_start]
+# section of .streamlit/secrets.toml
+DEFAULT_WARM_START_SETTINGS = {
+    "models": [DEFAULT_MODEL],
+    "refresh_interval": 30 * 60,
+}
+
+INITIAL_PROMPT = """Hi! 👋 I'm your career guidance counselor. I'd love to learn more about you 
+        to help find careers that match your interests and strengths. 
+        Let's start with your interests! What do you enjoy the most?
+        Here are some examples:
+        """
+
+INITIAL_OPTIONS = [
+    "I like building, fixing, or working with my hands",
+    "I enjoy solving problems and learning how things work",
+    "I love creating art, music, or writing",
+    "I like helping, teaching, or supporting others",
+    "I'm interested in leading, managing, or starting projects",
+]
+
+# Conversation before the first answer, the same for every session
+FIRST_TURN = [ChatMessage("assistant", INITIAL_PROMPT)]
+
+
+def build_assessment_messages(
+    user_input, aiks_data=None, chat_history=(), context=None
+) -> list[dict]:
+    """Build the prompt messages for the next assessment turn.
+
+    chat_history must not include user_input itself.
+    """
+    system_prompt = """You are a friendly career guidance counselor conducting an assessment with a teenager. 
+    Your goal is to gather information about their Abilities, Interests, Knowledge, and Skills (AIKS).
+
+    Guidelines:
+    1. Ask engaging questions that are easy for teens to answer
+    2. Always provide 2-5 example options they can choose from, don't suggest "Other" vague options, it must be copy-pastable
+    3. Keep the tone casual and encouraging
+    4. Acknowledge and build upon their previous answers
+    5. Use examples and scenarios teens can relate to
+
+    Current AIKS Data:
+    {aiks_data}
+
+    Chat History:
+    {chat_history}"""
+
+    context = context or new_conversation_context()
+    aiks_data = aiks_data or {category: [] for category in AIKS_CATEGORIES}
+    system_prompt = system_prompt.format(**context.render(aiks_data, chat_history))
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_input},
+    ]
+
+
+def fetch_assessment(client, model, messages) -> AssessmentResponse:
+    """Request the next assessment turn, safe to call outside the script thread"""
+    return get_llm_gateway().call(
+        "assessment",
+        lambda routed_model: client.chat.completions.create(
+            model=routed_model,
+            response_model=AssessmentResponse,
+            messages=messages,
+            temperature=0.7,
+        ),
+        model,
+        messages,
+        AssessmentResponse,
+    )
+
+
+class WarmStartCache:
+    """First-turn replies for the initial options, shared by all sessions.
+
+    Every session starts from the same prompt and options, so the replies are
+    fetched once per model in a background thread and refreshed periodically.
+    The client is created in that thread too, so loading the LLM stack doesn't
+    hold up the first page view.
+    """
+
+    def __init__(self, groq_api_key: str, refresh_interval: float):
+        self.groq_api_key = groq_api_key
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self._responses: dict[tuple[str, str], AssessmentResponse] = {}
+        self._models: set[str] = set()
+        self._lock = threading.Lock()
+
+    def warm_up(self, model: str):
+        """Start keeping the replies for model warm, once per model"""
+        with self._lock:
+            if model in self._models:
+                return
+            self._models.add(model)
+
+        threading.Thread(
+            # Refreshes wait behind the turns users are waiting for
+            target=background(self._refresh_loop),
+            args=(model,),
+            name=f"warm-start-{model}",
+            daemon=True,
+        ).start()
+
+    def _refresh_loop(self, model: str):
+        client = get_llm_client(self.groq_api_key)
+        while True:
+            for option in INITIAL_OPTIONS:
+                try:
+                    response = fetch_assessment(
+                        client,
+                        model,
+                        build_assessment_messages(option, chat_history=FIRST_TURN),
+                    )
+                except Exception:
+                    # Keep serving the previous reply, the next refresh retries
+                    continue
+                with self._lock:
+                    self._responses[(model, option)] = response
+            time.sleep(self.refresh_interval)
+
+    def get(self, model: str, option: str):
+        """Get a private copy of the warm reply, or None if not fetched yet"""
+        with self._lock:
+            response = self._responses.get((model, option))
+            if response is None:
+                return None
+            self.hits += 1
+        return response.model_copy(deep=True)
+
+    def __contains__(self, key: tuple[str, str]):
+        return key in self._responses
+
+    def __len__(self):
+        return len(self._responses)
+
+
+@st.cache_resource(show_spinner=False)
+def get_warm_start_cache(groq_api_key: str) -> WarmStartCache:
+    """Get the process-wide warm start cache, warming up the configured models"""
+    settings = {**DEFAULT_WARM_START_SETTINGS, **get_settings("warm_start")}
+    cache = WarmStartCache(groq_api_key, refresh_interval=settings["refresh_interval"])
+    for model in settings["models"]:
+        cache.warm_up(model)
+    return cache
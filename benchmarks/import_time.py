@@ -0,0 +1,148 @@
+# benchmarks/import_time.py
+"""Report the import cost of the first view of every page, like -X importtime.
+
+Each page gets a fresh interpreter with Streamlit and AppTest already loaded,
+as a `streamlit run` server has them, and its first script run is measured
+with -X importtime, against the mock Groq API and an empty cache. Reported
+per page: the total import time, the part spent on the LLM stack (instructor,
+groq, openai) and the heaviest packages. The warm start is switched off, its
+background imports aren't part of a view.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --json imports.json
+    python -m benchmarks.import_time --compare imports.json --budget 300
+
+Exits with 1 when a page is over --budget milliseconds, so it can gate CI.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PAGES = ["Home.py"] + sorted(
+    str(path.relative_to(ROOT)) for path in (ROOT / "pages").glob("[!_]*.py")
+)
+
+# Packages that should only load when the first LLM call is made
+LLM_STACK = {"instructor", "groq", "openai"}
+
+MARKER = "import time: -- page --"
+
+CHILD = f"""
+import os, sys, tempfile
+sys.path.insert(0, {str(ROOT)!r})
+from streamlit.testing.v1 import AppTest
+from benchmarks.mock_groq import MockGroqServer
+
+os.environ["GROQ_BASE_URL"] = MockGroqServer(latency=0).start().base_url
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+at.secrets["groq"] = {{"api_key": "import-time"}}
+at.secrets["cache"] = {{"path": os.path.join(tempfile.mkdtemp(), "cache.sqlite")}}
+print({MARKER!r}, file=sys.stderr, flush=True)
+
+# Warm-up imports happen in threads of their own, the view doesn't wait for them
+from assessment import WarmStartCache
+WarmStartCache.warm_up = lambda self, model: None
+at.run()
+for exception in at.exception:
+    print(exception.message, file=sys.stderr)
+    sys.exit(1)
+"""
+
+
+def parse_importtime(output: str) -> dict[str, float]:
+    """Self import time in ms per top-level package, after the marker"""
+    _, _, lines = output.partition(MARKER)
+    packages = defaultdict(float)
+    for line in lines.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue
+        packages[name.strip().split(".")[0]] += int(self_us) / 1000
+    return dict(packages)
+
+
+def measure_page(page: str) -> dict[str, float]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD, page],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{page} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def measure(page: str, repeat: int) -> dict:
+    """The run with the median total of repeat fresh interpreters"""
+    runs = sorted(
+        (measure_page(page) for _ in range(repeat)),
+        key=lambda packages: sum(packages.values()),
+    )
+    packages = runs[len(runs) // 2]
+    return {
+        "page": page,
+        "total_ms": sum(packages.values()),
+        "llm_stack_ms": sum(ms for name, ms in packages.items() if name in LLM_STACK),
+        "packages": packages,
+        "totals_ms": [sum(run.values()) for run in runs],
+    }
+
+
+def print_report(results: list[dict], top: int, baseline: dict = None):
+    previous = {r["page"]: r for r in (baseline or {}).get("results", [])}
+    header = f"{'page':<36} {'total':>9} {'llm stack':>10} {'spread':>8} {'change':>8}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        before = previous.get(result["page"])
+        change = (
+            f"{(result['total_ms'] - before['total_ms']) / before['total_ms']:+7.0%}"
+            if before and before["total_ms"]
+            else "     n/a"
+        )
+        spread = max(result["totals_ms"]) - min(result["totals_ms"])
+        print(
+            f"{result['page']:<36} {result['total_ms']:>7.0f}ms "
+            f"{result['llm_stack_ms']:>8.0f}ms {spread:>6.0f}ms {change:>8}"
+        )
+        heaviest = sorted(result["packages"].items(), key=lambda item: -item[1])
+        print("    " + ", ".join(f"{name} {ms:.0f}ms" for name, ms in heaviest[:top]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page", action="append", choices=PAGES, help="default: all")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per page")
+    parser.add_argument("--top", type=int, default=8, help="packages listed per page")
+    parser.add_argument("--budget", type=float, help="fail over this many ms")
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run")
+    args = parser.parse_args()
+
+    results = [measure(page, args.repeat) for page in args.page or PAGES]
+    baseline = None
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+    print_report(results, args.top, baseline)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"results": results}, indent=2))
+
+    if args.budget is not None:
+        over = [r["page"] for r in results if r["total_ms"] > args.budget]
+        if over:
+            print(f"\nOver the {args.budget:.0f}ms budget: {', '.join(over)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
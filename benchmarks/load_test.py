@@ -0,0 +1,404 @@
+# benchmarks/load_test.py
+"""Drive N concurrent simulated users against one Streamlit server.
+
+Starts `streamlit run Home.py` backed by the mock Groq server and connects
+users over Streamlit's own websocket protocol, like browsers do. Every user
+replays a scripted session from benchmarks/sessions.py, with a think time
+between steps. For each number of users it reports interaction latency
+p50/p99, server memory per session and CPU, LLM call latency seen by the app,
+and how long LLM calls queue inside the app on average: the app's LLM span
+latency minus the mock's service time.
+
+    python -m benchmarks.load_test --users 1 5 10 20
+    python -m benchmarks.load_test --users 30 --session matches --latency 1.0
+    python -m benchmarks.load_test --users 20 --requests-per-minute 30
+
+The gateway rate limit is off unless --requests-per-minute or
+--tokens-per-minute is given, the mock server itself has no limits.
+
+Server memory and CPU are read from /proc, so they are only reported on Linux.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.Common_pb2 import StringTriggerValue
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.httpclient import HTTPRequest
+from tornado.websocket import websocket_connect
+
+from benchmarks.mock_groq import MockGroqServer
+from benchmarks.sessions import SESSIONS
+from perf import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+
+FINISHED = {
+    ForwardMsg.FINISHED_SUCCESSFULLY,
+    ForwardMsg.FINISHED_WITH_COMPILE_ERROR,
+    ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+}
+WIDGET_TYPES = ("button", "button_group", "chat_input")
+
+
+def url_pathname(page: str) -> str:
+    """URL path of a page script, e.g. pages/2_Matching_Professions.py"""
+    return re.sub(r"^\d+_", "", Path(page).stem)
+
+
+class SimulatedUser:
+    """One browser session, speaking Streamlit's websocket protocol"""
+
+    def __init__(self, base_url: str, steps: list, think_time: float):
+        self.base_url = base_url
+        self.steps = steps
+        self.think_time = think_time
+        self.latencies = []
+        self.errors = []
+        self.pages = {}
+        self.page_hash = ""
+        self.widgets = []
+        # Values the user set that a browser sends back with every rerun
+        self.values: dict[str, WidgetState] = {}
+        self._cache = {}
+        self._ws = None
+
+    async def connect(self):
+        ws_url = self.base_url.replace("http", "ws", 1) + "/_stcore/stream"
+        request = HTTPRequest(ws_url, headers={"Origin": self.base_url})
+        self._ws = await websocket_connect(request, subprotocols=["streamlit"])
+
+    async def read_run(self):
+        """Read messages until the script run, and any st.rerun() after it, ends"""
+        while True:
+            data = await self._ws.read_message()
+            if data is None:
+                raise ConnectionError("The server closed the connection")
+            msg = ForwardMsg.FromString(data)
+            if msg.WhichOneof("type") == "ref_hash":
+                msg = self._cache[msg.ref_hash]
+            elif msg.metadata.cacheable:
+                self._cache[msg.hash] = msg
+
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                self.widgets = []
+                for page in msg.new_session.app_pages:
+                    name = "" if page.is_default else page.url_pathname
+                    self.pages[name] = page.page_script_hash
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type in WIDGET_TYPES:
+                    self.widgets.append((element_type, getattr(element, element_type)))
+                elif element_type == "exception":
+                    self.errors.append(element.exception.message)
+            elif kind == "script_finished" and msg.script_finished in FINISHED:
+                return
+
+    async def rerun(self, *triggers: WidgetState):
+        live_ids = {widget.id for _, widget in self.widgets}
+        msg = BackMsg()
+        msg.rerun_script.page_script_hash = self.page_hash
+        msg.rerun_script.widget_states.widgets.extend(
+            [state for wid, state in self.values.items() if wid in live_ids]
+            + list(triggers)
+        )
+        start = time.perf_counter()
+        await self._ws.write_message(msg.SerializeToString(), binary=True)
+        await self.read_run()
+        self.latencies.append(time.perf_counter() - start)
+
+    def widgets_of(self, widget_type: str, prefix: str = "") -> list:
+        return [
+            widget
+            for kind, widget in self.widgets
+            if kind == widget_type and getattr(widget, "label", "").startswith(prefix)
+        ]
+
+    # Steps, as in benchmarks/sessions.py
+
+    async def open(self, page: str):
+        name = "" if page == "Home.py" else url_pathname(page)
+        self.page_hash = self.pages.get(name, "")
+        self.values.clear()
+        await self.rerun()
+
+    async def click_nth(self, prefix: str, idx: int):
+        buttons = self.widgets_of("button", prefix)
+        if idx < len(buttons):
+            await self.rerun(WidgetState(id=buttons[idx].id, trigger_value=True))
+
+    async def option(self, idx: int):
+        await self.click_nth("📌", idx)
+
+    async def question(self, idx: int):
+        await self.click_nth("❓", idx)
+
+    async def click(self, label: str):
+        buttons = [b for b in self.widgets_of("button") if b.label == label]
+        if buttons:
+            await self.rerun(WidgetState(id=buttons[0].id, trigger_value=True))
+
+    async def say(self, text: str):
+        inputs = self.widgets_of("chat_input")
+        if inputs:
+            state = WidgetState(
+                id=inputs[0].id, string_trigger_value=StringTriggerValue(data=text)
+            )
+            await self.rerun(state)
+
+    async def like(self, count: int):
+        # Thumbs up is the first button of each profession card's st.feedback
+        for feedback in self.widgets_of("button_group")[:count]:
+            state = WidgetState(id=feedback.id)
+            state.int_array_value.data[:] = [0]
+            self.values[feedback.id] = state
+        await self.rerun()
+
+    async def run(self, start_delay: float):
+        await asyncio.sleep(start_delay)
+        try:
+            await self.connect()
+            for action, argument in self.steps:
+                await getattr(self, action)(argument)
+                await asyncio.sleep(self.think_time * random.uniform(0.5, 1.5))
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            if self._ws is not None:
+                self._ws.close()
+
+
+class ServerProcess:
+    """The Streamlit server under test, with memory and CPU from /proc"""
+
+    def __init__(self, port: int, secrets_path: str, groq_base_url: str):
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "streamlit",
+                "run",
+                str(ROOT / "Home.py"),
+                f"--server.port={port}",
+                "--server.headless=true",
+                "--browser.gatherUsageStats=false",
+                f"--secrets.files={secrets_path}",
+            ],
+            cwd=ROOT,
+            env={**os.environ, "GROQ_BASE_URL": groq_base_url},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def wait_ready(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                with urllib.request.urlopen(f"{self.base_url}/_stcore/health") as r:
+                    if r.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        raise TimeoutError("The Streamlit server didn't start")
+
+    def rss(self):
+        """Resident memory in bytes"""
+        try:
+            status = Path(f"/proc/{self.process.pid}/status").read_text()
+        except OSError:
+            return None
+        return int(re.search(r"VmRSS:\s+(\d+) kB", status).group(1)) * 1024
+
+    def cpu_time(self):
+        """User and system CPU seconds used so far"""
+        try:
+            fields = Path(f"/proc/{self.process.pid}/stat").read_text().split()
+        except OSError:
+            return None
+        return (int(fields[13]) + int(fields[14])) / os.sysconf("SC_CLK_TCK")
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait(10)
+
+
+def read_spans(path: Path, since_ns: int) -> list[dict]:
+    if not path.exists():
+        return []
+    spans = []
+    for line in path.read_text().splitlines():
+        span = json.loads(line)
+        if span["start_time_unix_nano"] >= since_ns:
+            spans.append(span)
+    return spans
+
+
+async def run_level(server, mock, users: int, args, traces: Path) -> dict:
+    requests_before = mock.stats.requests
+    durations_before = len(mock.stats.durations())
+    rss_before, cpu_before = server.rss(), server.cpu_time()
+    since_ns = time.time_ns()
+    start = time.perf_counter()
+
+    simulated = [
+        SimulatedUser(server.base_url, SESSIONS[args.session], args.think_time)
+        for _ in range(users)
+    ]
+    running = asyncio.gather(
+        *[user.run(random.uniform(0, args.ramp_up)) for user in simulated]
+    )
+    # Sessions are cleaned up after users leave, so memory is sampled meanwhile
+    rss_peak = rss_before
+    while not running.done():
+        rss_peak = max(rss_peak or 0, server.rss() or 0) or None
+        await asyncio.sleep(0.2)
+    await running
+    wall = time.perf_counter() - start
+
+    # Spans are exported in the background
+    await asyncio.sleep(1.5)
+    cpu_after = server.cpu_time()
+    latencies = [latency for user in simulated for latency in user.latencies]
+    span_latencies = [
+        (span["end_time_unix_nano"] - span["start_time_unix_nano"]) / 1e9
+        for span in read_spans(traces, since_ns)
+    ]
+    service_times = mock.stats.durations(durations_before)
+
+    # Each span is one request to the mock, so the difference of the totals is
+    # the time requests waited in the app (pools, semaphores, the event loop)
+    queueing = None
+    if span_latencies:
+        queueing = max(sum(span_latencies) - sum(service_times), 0.0)
+        queueing /= len(span_latencies)
+
+    return {
+        "users": users,
+        "interactions": len(latencies),
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "errors": sum(len(user.errors) for user in simulated),
+        "first_error": next(
+            (user.errors[0] for user in simulated if user.errors), None
+        ),
+        "memory_per_session": (
+            (rss_peak - rss_before) / users if rss_before and rss_peak else None
+        ),
+        "rss": rss_peak,
+        "cpu": (cpu_after - cpu_before) / wall if cpu_before is not None else None,
+        "llm_calls": mock.stats.requests - requests_before,
+        "llm_in_flight_max": mock.stats.max_in_flight,
+        "llm_p99": percentile(span_latencies, 0.99),
+        "queue_avg": queueing,
+    }
+
+
+def format_seconds(value) -> str:
+    return "–" if value is None else f"{value * 1000:.0f}ms"
+
+
+def format_mib(value) -> str:
+    return "–" if value is None else f"{value / 2**20:.1f}MiB"
+
+
+def format_percent(value) -> str:
+    return "–" if value is None else f"{value:.0%}"
+
+
+def print_level(result: dict):
+    print(
+        f"{result['users']:>5} {result['interactions']:>6} "
+        f"{format_seconds(result['p50']):>8} {format_seconds(result['p99']):>8} "
+        f"{result['errors']:>6} {format_mib(result['memory_per_session']):>10} "
+        f"{format_mib(result['rss']):>10} "
+        f"{format_percent(result['cpu']):>6} "
+        f"{result['llm_calls']:>5} {format_seconds(result['llm_p99']):>8} "
+        f"{format_seconds(result['queue_avg']):>9}"
+    )
+    if result["first_error"]:
+        print(f"      ⚠️ {result['first_error']}")
+
+
+async def main_async(args):
+    mock = MockGroqServer(
+        latency=args.latency, tokens_per_second=args.tokens_per_second
+    ).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        traces = Path(tmp) / "llm_calls.jsonl"
+        secrets_path = Path(tmp) / "secrets.toml"
+        secrets_path.write_text(
+            f"""[groq]
+api_key = "load-test"
+
+[cache]
+path = "{Path(tmp) / 'cache.sqlite'}"
+
+[tracing]
+exporter = "jsonl"
+path = "{traces}"
+flush_interval = 0.5
+
+[gateway]
+requests_per_minute = {args.requests_per_minute}
+tokens_per_minute = {args.tokens_per_minute}
+"""
+        )
+        server = ServerProcess(args.port, str(secrets_path), mock.base_url)
+        try:
+            server.wait_ready()
+            print(
+                f"{'users':>5} {'steps':>6} {'p50':>8} {'p99':>8} {'errors':>6} "
+                f"{'mem/sess':>10} {'peak rss':>10} {'cpu':>6} {'llm':>5} "
+                f"{'llm p99':>8} {'queue avg':>9}"
+            )
+            # Imports and process-wide caches shouldn't count as session memory
+            await run_level(server, mock, 1, args, traces)
+            results = []
+            for users in args.users:
+                result = await run_level(server, mock, users, args, traces)
+                print_level(result)
+                results.append(result)
+        finally:
+            server.stop()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--session", choices=sorted(SESSIONS), default="liked_chat")
+    parser.add_argument("--think-time", type=float, default=1.0, help="seconds")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds")
+    parser.add_argument("--latency", type=float, default=0.3, help="mock latency, s")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    parser.add_argument(
+        "--requests-per-minute", type=int, default=0, help="gateway limit, 0 is off"
+    )
+    parser.add_argument(
+        "--tokens-per-minute", type=int, default=0, help="gateway limit, 0 is off"
+    )
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--json", help="save the results to this file")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
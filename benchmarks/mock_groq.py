@@ -0,0 +1,423 @@
+# benchmarks/mock_groq.py
+"""Local stand-in for the Groq chat completions API.
+
+Answers instructor's JSON and tool-calling requests with canned payloads for
+the app's response models, or payloads generated from the request's JSON
+schema for anything else. Latency and token rate are configurable, streamed
+answers are sent as server-sent events at that rate.
+
+Run it on its own and point the app at it with GROQ_BASE_URL:
+
+    python -m benchmarks.mock_groq --port 8765 --latency 0.3
+    GROQ_BASE_URL=http://127.0.0.1:8765 streamlit run Home.py
+"""
+
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+
+# Canned payloads per response model, handed out in turn
+PROFESSION_TITLES = [
+    "Game Designer",
+    "Software Developer",
+    "Animator",
+    "Data Scientist",
+    "Graphic Designer",
+    "UX Researcher",
+    "Science Teacher",
+    "Nurse",
+]
+
+CANNED_PAYLOADS = {
+    "AssessmentResponse": [
+        {
+            "next_question": "What do you enjoy doing after school?",
+            "analysis": "Looking for interests outside of the classroom.",
+            "aiks_updates": {
+                "abilities": ["creativity"],
+                "interests": ["video games", "drawing"],
+                "knowledge": [],
+                "skills": [],
+            },
+            "suggested_options": ["Drawing", "Playing games", "Coding"],
+        },
+        {
+            "next_question": "Which school subject feels the easiest to you?",
+            "analysis": "Knowledge areas help to narrow down the fields.",
+            "aiks_updates": {
+                "abilities": ["logical thinking"],
+                "interests": [],
+                "knowledge": ["mathematics"],
+                "skills": ["python"],
+            },
+            "suggested_options": ["Math", "Art", "Biology"],
+        },
+        {
+            "next_question": "Do you prefer working alone or in a team?",
+            "analysis": "Work style points to suitable environments.",
+            "aiks_updates": {
+                "abilities": ["communication"],
+                "interests": ["helping people"],
+                "knowledge": ["biology"],
+                "skills": ["teamwork"],
+            },
+            "suggested_options": ["Alone", "In a team", "Both"],
+        },
+    ],
+    "Profession": [
+        {
+            "title": title,
+            "explanation": f"{title} matches your creativity and interests.",
+            "required_skills": ["communication", "problem solving"],
+            "aiks_alignment": {"interests": ["video games"], "skills": ["python"]},
+            "daily_life_example": f"A {title} starts the day with a team sync.",
+        }
+        for title in PROFESSION_TITLES
+    ],
+    "ProfessionTitles": [{"titles": PROFESSION_TITLES[:5]}],
+    "ProfessionDossier": [
+        {
+            "answers": [
+                {
+                    "question": question,
+                    "answer": f"Here is what you should know: {question.lower()} "
+                    "It depends on the employer, but most people find their way.",
+                }
+                for question in [
+                    "What education or training do I need?",
+                    "What's a typical work day like?",
+                    "What skills are most important?",
+                    "What companies are hiring?",
+                    "What's the salary range?",
+                    "What are the challenges?",
+                ]
+            ]
+        }
+    ],
+    "ChatResponse": [
+        {
+            "content": "Most people in this career start with a related degree "
+            "or a portfolio of projects, then learn on the job from seniors.",
+            "tone": "friendly",
+            "focus_areas": ["education", "experience"],
+        }
+    ],
+}
+
+
+def prompt_titles(messages: list[dict]) -> list[str]:
+    """Profession titles the prompt asks about, so answers can match them"""
+    text = "\n".join(str(message.get("content", "")) for message in messages)
+    titles = re.findall(r'describe the profession "([^"]+)"', text)
+    if listed := re.search(r"Professions:\s*\n((?:[ \t]*- .+\n?)+)", text):
+        titles += re.findall(r"- (.+)", listed.group(1))
+    return [title.strip() for title in titles]
+
+
+class PayloadFactory:
+    """Builds answers for a response model JSON schema"""
+
+    def __init__(self):
+        self._canned = {
+            name: itertools.cycle(payloads)
+            for name, payloads in CANNED_PAYLOADS.items()
+        }
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def build(self, schema: dict, messages: list[dict]):
+        titles = iter(prompt_titles(messages))
+        with self._lock:
+            return self._value(schema, schema.get("$defs", {}), titles, None)
+
+    def _value(self, schema: dict, defs: dict, titles, name):
+        if "$ref" in schema:
+            name = schema["$ref"].split("/")[-1]
+            schema = defs[name]
+        name = schema.get("title", name)
+        # create_partial() sends the schema of a Partial<Model> wrapper
+        canned = self._canned.get(str(name).removeprefix("Partial"))
+        if canned is not None:
+            payload = json.loads(json.dumps(next(canned)))
+            if "title" in payload:
+                payload["title"] = next(titles, payload["title"])
+            return payload
+        if "anyOf" in schema:
+            options = [s for s in schema["anyOf"] if s.get("type") != "null"]
+            return self._value(options[0], defs, titles, name)
+
+        kind = schema.get("type")
+        if kind == "object":
+            if "properties" in schema:
+                return {
+                    key: self._value(prop, defs, titles, key)
+                    for key, prop in schema["properties"].items()
+                }
+            values = schema.get("additionalProperties", {})
+            return {
+                category: self._value(values, defs, titles, category)
+                for category in ("interests", "skills")
+            }
+        if kind == "array":
+            items = schema.get("items", {})
+            item_schema = items
+            if "$ref" in items:
+                item_schema = defs[items["$ref"].split("/")[-1]]
+            count = 3
+            if "title" in item_schema.get("properties", {}):
+                # One profession per title the prompt named, if it named any
+                remaining = list(titles)
+                titles = iter(remaining)
+                count = len(remaining) or 5
+            return [self._value(items, defs, titles, name) for _ in range(count)]
+        if kind == "integer":
+            return next(self._counter)
+        if kind == "number":
+            return float(next(self._counter))
+        if kind == "boolean":
+            return True
+        if name and name.lower() == "title":
+            return next(titles, f"Profession {next(self._counter)}")
+        return f"{name or 'text'} {next(self._counter)}"
+
+
+def request_schema(body: dict):
+    """Get the response model schema and whether it goes into a tool call"""
+    if body.get("tools"):
+        function = body["tools"][0]["function"]
+        # The response model name is the function name, not the schema title
+        return {**function["parameters"], "title": function["name"]}, True
+
+    # The last one, instructor can leave earlier ones in reused message lists
+    for message in reversed(body.get("messages", [])):
+        content = str(message.get("content", ""))
+        marker = content.rfind("json_schema:")
+        if marker != -1:
+            start = content.index("{", marker)
+            schema, _ = json.JSONDecoder().raw_decode(content[start:])
+            return schema, False
+    return {"type": "object", "properties": {}}, False
+
+
+class MockStats:
+    def __init__(self):
+        self.requests = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._durations = []
+        self._lock = threading.Lock()
+
+    def durations(self, since: int = 0) -> list[float]:
+        """Time the server spent on each request, in completion order"""
+        with self._lock:
+            return self._durations[since:]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                key: value
+                for key, value in vars(self).items()
+                if not key.startswith("_")
+            }
+
+
+class MockGroqServer(ThreadingHTTPServer):
+    """Mock chat completions server, run it with start() in a daemon thread"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.2,
+        tokens_per_second: float = 500.0,
+    ):
+        super().__init__((host, port), MockGroqHandler)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.payloads = PayloadFactory()
+        self.stats = MockStats()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(
+            target=self.serve_forever, name="mock-groq", daemon=True
+        ).start()
+        return self
+
+
+class MockGroqHandler(BaseHTTPRequestHandler):
+    server: MockGroqServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.count_sent(len(data))
+
+    def count_sent(self, size: int):
+        with self.server.stats._lock:
+            self.server.stats.bytes_sent += size
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.loads(raw)
+        stats = self.server.stats
+        start = time.perf_counter()
+        with stats._lock:
+            stats.requests += 1
+            stats.bytes_received += len(raw)
+            stats.in_flight += 1
+            stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        try:
+            self.complete(body, len(raw))
+        finally:
+            with stats._lock:
+                stats.in_flight -= 1
+                stats._durations.append(time.perf_counter() - start)
+
+    def complete(self, body: dict, request_size: int):
+        schema, as_tool = request_schema(body)
+        content = json.dumps(self.server.payloads.build(schema, body["messages"]))
+        usage = {
+            "prompt_tokens": request_size // CHARS_PER_TOKEN,
+            "completion_tokens": len(content) // CHARS_PER_TOKEN + 1,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        with self.server.stats._lock:
+            self.server.stats.prompt_tokens += usage["prompt_tokens"]
+            self.server.stats.completion_tokens += usage["completion_tokens"]
+
+        time.sleep(self.server.latency)
+        base = {
+            "id": f"chatcmpl-mock-{self.server.stats.requests}",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+        }
+        if body.get("stream"):
+            self.stream(base, content, usage, as_tool, body)
+            return
+
+        time.sleep(usage["completion_tokens"] / self.server.tokens_per_second)
+        message = {"role": "assistant", "content": content}
+        if as_tool:
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [tool_call(body, content)],
+            }
+        self.send_json(
+            200,
+            {
+                **base,
+                "object": "chat.completion",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": "tool_calls" if as_tool else "stop",
+                        "logprobs": None,
+                    }
+                ],
+                "usage": usage,
+            },
+        )
+
+    def stream(self, base: dict, content: str, usage: dict, as_tool: bool, body: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(data: str):
+            event = f"data: {data}\n\n".encode()
+            self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+            self.wfile.flush()
+            self.count_sent(len(event))
+
+        def chunk(delta: dict, finish_reason=None, **extra) -> str:
+            return json.dumps(
+                {
+                    **base,
+                    "object": "chat.completion.chunk",
+                    "choices": [
+                        {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                    ],
+                    **extra,
+                }
+            )
+
+        step = CHARS_PER_TOKEN * 4
+        delay = 4 / self.server.tokens_per_second
+        for idx, start in enumerate(range(0, len(content), step)):
+            piece = content[start : start + step]
+            if as_tool:
+                call = tool_call(body, piece)
+                if idx:
+                    call = {"index": 0, "function": {"arguments": piece}}
+                delta = {"tool_calls": [{"index": 0, **call}]}
+            else:
+                delta = {"role": "assistant", "content": piece}
+            send_event(chunk(delta))
+            time.sleep(delay)
+
+        send_event(
+            chunk({}, "tool_calls" if as_tool else "stop", x_groq={"usage": usage})
+        )
+        send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def tool_call(body: dict, arguments: str) -> dict:
+    return {
+        "id": "call_mock",
+        "type": "function",
+        "function": {
+            "name": body["tools"][0]["function"]["name"],
+            "arguments": arguments,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    args = parser.parse_args()
+
+    server = MockGroqServer(args.host, args.port, args.latency, args.tokens_per_second)
+    print(f"Mock Groq API on {server.base_url}, set GROQ_BASE_URL to use it")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
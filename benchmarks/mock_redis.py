@@ -0,0 +1,311 @@
+# benchmarks/mock_redis.py
+"""Local stand-in for a Redis server, for the redis cache backend.
+
+Speaks enough of the Redis protocol (RESP2) for the app's shared caches and
+session store: strings with expiry, hashes, sorted sets and MULTI/EXEC
+pipelines, all kept in memory. Point one or more app replicas at it to try
+resuming sessions across servers without installing Redis:
+
+    python -m benchmarks.mock_redis --port 6390
+
+    # .streamlit/secrets.toml of every replica
+    [cache]
+    backend = "redis"
+    redis_url = "redis://127.0.0.1:6390/0"
+"""
+
+import argparse
+import threading
+import time
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+
+
+class CommandError(Exception):
+    pass
+
+
+def format_score(score: float) -> str:
+    return repr(score) if score != int(score) else str(int(score))
+
+
+class ZSet(dict):
+    """Sorted set members and their scores, sorted when read"""
+
+
+class Keyspace:
+    """Keys of one mock server, with lazy expiry like Redis"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.commands = 0
+        self.lock = threading.Lock()
+
+    def _alive(self, key: str) -> bool:
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            del self.expires[key]
+        return key in self.data
+
+    def _get(self, key: str, kind: type, create: bool = False):
+        if not self._alive(key):
+            if not create:
+                return None
+            self.data[key] = kind()
+        value = self.data[key]
+        if not isinstance(value, kind):
+            raise CommandError(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        return value
+
+    def execute(self, name: str, args: list[str]):
+        with self.lock:
+            self.commands += 1
+            handler = getattr(self, f"cmd_{name.lower()}", None)
+            if handler is None:
+                raise CommandError(f"ERR unknown command '{name}'")
+            return handler(*args)
+
+    # Connection
+
+    def cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_select(self, db):
+        return "OK"
+
+    def cmd_client(self, *args):
+        return "OK"
+
+    # Keys and strings
+
+    def cmd_get(self, key):
+        return self._get(key, str)
+
+    def cmd_set(self, key, value, *options):
+        self.data[key] = value
+        self.expires.pop(key, None)
+        options = [option.upper() for option in options]
+        if "EX" in options:
+            seconds = int(options[options.index("EX") + 1])
+            self.expires[key] = time.monotonic() + seconds
+        return "OK"
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self.data[key]
+                self.expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def cmd_exists(self, *keys):
+        return sum(self._alive(key) for key in keys)
+
+    def cmd_expire(self, key, seconds):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(seconds)
+        return 1
+
+    def cmd_dbsize(self):
+        return sum(self._alive(key) for key in list(self.data))
+
+    def cmd_flushall(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        return "OK"
+
+    # Hashes
+
+    def cmd_hset(self, key, *pairs):
+        fields = self._get(key, dict, create=True)
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in fields
+            fields[field] = value
+        return added
+
+    def cmd_hget(self, key, field):
+        return (self._get(key, dict) or {}).get(field)
+
+    def cmd_hgetall(self, key):
+        return dict(self._get(key, dict) or {})
+
+    def cmd_hdel(self, key, *names):
+        fields = self._get(key, dict) or {}
+        return sum(fields.pop(name, None) is not None for name in names)
+
+    # Sorted sets
+
+    def cmd_zadd(self, key, *pairs):
+        members = self._get(key, ZSet, create=True)
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            added += member not in members
+            members[member] = float(score)
+        return added
+
+    def cmd_zrem(self, key, *names):
+        members = self._get(key, ZSet) or {}
+        return sum(members.pop(name, None) is not None for name in names)
+
+    def cmd_zcard(self, key):
+        return len(self._get(key, ZSet) or {})
+
+    def cmd_zremrangebyscore(self, key, low, high):
+        members = self._get(key, ZSet) or {}
+        low, high = float(low), float(high)
+        removed = [m for m, score in members.items() if low <= score <= high]
+        for member in removed:
+            del members[member]
+        return len(removed)
+
+    def cmd_zpopmin(self, key, count="1"):
+        members = self._get(key, ZSet) or {}
+        popped = sorted(members.items(), key=lambda item: (item[1], item[0]))
+        popped = popped[: int(count)]
+        for member, _ in popped:
+            del members[member]
+        return tuple(popped)
+
+
+class MockRedisServer(ThreadingTCPServer):
+    """Mock Redis server, run it with start() in a daemon thread"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), MockRedisHandler)
+        self.keyspace = Keyspace()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        threading.Thread(
+            target=self.serve_forever, name="mock-redis", daemon=True
+        ).start()
+        return self
+
+
+class MockRedisHandler(StreamRequestHandler):
+    server: MockRedisServer
+
+    def setup(self):
+        super().setup()
+        # RESP2 until the client asks for RESP3 with HELLO, like Redis 6+
+        self.protocol = 2
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command, e.g. typed into telnet
+            return line.decode().split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2].decode())
+        return args
+
+    def hello(self, version="2", *args):
+        if version not in ("2", "3"):
+            return CommandError("NOPROTO unsupported protocol version")
+        self.protocol = int(version)
+        return {
+            "server": "redis",
+            "version": "7.0.0",
+            "proto": self.protocol,
+            "id": threading.get_ident(),
+            "mode": "standalone",
+            "role": "master",
+            "modules": [],
+        }
+
+    def encode(self, reply) -> bytes:
+        resp3 = self.protocol == 3
+        if isinstance(reply, CommandError):
+            return f"-{reply}\r\n".encode()
+        if reply is None:
+            return b"_\r\n" if resp3 else b"$-1\r\n"
+        if isinstance(reply, (bool, int)):
+            return f":{int(reply)}\r\n".encode()
+        if isinstance(reply, float):
+            if resp3:
+                return f",{format_score(reply)}\r\n".encode()
+            reply = format_score(reply)
+        if reply in ("OK", "PONG", "QUEUED"):
+            return f"+{reply}\r\n".encode()
+        if isinstance(reply, dict):
+            if resp3:
+                return f"%{len(reply)}\r\n".encode() + b"".join(
+                    self.encode(key) + self.encode(value)
+                    for key, value in reply.items()
+                )
+            reply = [item for pair in reply.items() for item in pair]
+        if isinstance(reply, tuple):
+            # Sorted set members with scores are pairs in RESP3, flat in RESP2
+            pairs = [list(pair) for pair in reply]
+            reply = pairs if resp3 else [item for pair in pairs for item in pair]
+        if isinstance(reply, list):
+            return f"*{len(reply)}\r\n".encode() + b"".join(
+                self.encode(item) for item in reply
+            )
+        data = str(reply).encode()
+        return f"${len(data)}\r\n".encode() + data + b"\r\n"
+
+    def handle(self):
+        keyspace = self.server.keyspace
+        queued = None
+        while (command := self.read_command()) is not None:
+            if not command:
+                continue
+            name, args = command[0].upper(), command[1:]
+            if name == "HELLO":
+                reply = self.hello(*args)
+            elif name == "MULTI":
+                queued, reply = [], "OK"
+            elif name == "EXEC" and queued is not None:
+                reply = []
+                for queued_name, queued_args in queued:
+                    try:
+                        reply.append(keyspace.execute(queued_name, queued_args))
+                    except CommandError as e:
+                        reply.append(e)
+                queued = None
+            elif name == "DISCARD" and queued is not None:
+                queued, reply = None, "OK"
+            elif queued is not None:
+                queued.append((name, args))
+                reply = "QUEUED"
+            else:
+                try:
+                    reply = keyspace.execute(name, args)
+                except CommandError as e:
+                    reply = e
+                except (TypeError, ValueError) as e:
+                    reply = CommandError(f"ERR {e}")
+            self.wfile.write(self.encode(reply))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    server = MockRedisServer(args.host, args.port)
+    print(f"Mock Redis on {server.url}, use it as redis_url in [cache]")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
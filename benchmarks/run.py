@@ -0,0 +1,280 @@
+# benchmarks/run.py
+"""Replay scripted sessions through AppTest against a mock Groq server.
+
+Reports per session: total and slowest rerun time, LLM calls, bytes sent to
+and received from the API, and peak Python memory (tracemalloc). Save a run
+with --json and pass it as --compare to a later run to see the difference.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --latency 0.5 --set matching_mode=llm --json base.json
+    python -m benchmarks.run --compare base.json
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from streamlit.runtime.state.common import TESTING_KEY  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from benchmarks.mock_groq import MockGroqServer  # noqa: E402
+from benchmarks.sessions import SESSIONS  # noqa: E402
+
+
+def buttons_with_prefix(at: AppTest, prefix: str) -> list:
+    return [button for button in at.button if button.label.startswith(prefix)]
+
+
+def thumbs_option(feedback):
+    """Option of st.feedback("thumbs") for a value, thumbs up (1) comes first"""
+    return lambda value: feedback.options[1 - value]
+
+
+class SessionRunner:
+    """Replays one scripted session in a fresh AppTest"""
+
+    def __init__(
+        self, server: MockGroqServer, settings: dict, cache_path: str, timeout: float
+    ):
+        self.server = server
+        self.settings = settings
+        self.cache_path = cache_path
+        self.timeout = timeout
+        self.at = None
+
+    def open(self, page: str) -> bool:
+        if self.at is None:
+            self.at = AppTest.from_file(str(ROOT / page), default_timeout=self.timeout)
+            self.at.secrets["groq"] = {"api_key": "benchmark"}
+            self.at.secrets["cache"] = {"path": self.cache_path}
+            # The mock has no rate limits, measure the app rather than the queue
+            self.at.secrets["gateway"] = {
+                "requests_per_minute": 0,
+                "tokens_per_minute": 0,
+            }
+            for key, value in self.settings.items():
+                self.at.session_state[key] = value
+        else:
+            self.at.switch_page(page)
+        return True
+
+    def option(self, idx: int) -> bool:
+        options = buttons_with_prefix(self.at, "📌")
+        if idx >= len(options):
+            return False
+        options[idx].click()
+        return True
+
+    def say(self, text: str) -> bool:
+        if not self.at.chat_input:
+            return False
+        self.at.chat_input[0].set_value(text)
+        return True
+
+    def like(self, count: int) -> bool:
+        # Thumbs up on the cards, so handle_feedback() starts the dossiers
+        state = self.at.session_state
+        if "generated_professions" not in state:
+            return False
+        for prof in state["generated_professions"][:count]:
+            self.at.button_group(key=f"feedback_{prof.title}").set_value([1])
+        return True
+
+    def question(self, idx: int) -> bool:
+        questions = buttons_with_prefix(self.at, "❓")
+        if idx >= len(questions):
+            return False
+        questions[idx].click()
+        return True
+
+    def click(self, label: str) -> bool:
+        buttons = [button for button in self.at.button if button.label == label]
+        if not buttons:
+            return False
+        buttons[0].click()
+        return True
+
+    def run(self):
+        # AppTest has no format_func to send the state of st.feedback back
+        # with, and reads its value as one number rather than a list
+        format_funcs = self.at.session_state[TESTING_KEY]
+        for feedback in self.at.get("button_group"):
+            format_funcs[feedback.id] = thumbs_option(feedback)
+            value = feedback.value
+            if not isinstance(value, list):
+                feedback.set_value([] if value is None else [value])
+        self.at.run()
+
+    def wait_for_background_calls(self, timeout: float = 30.0):
+        """Let prefetch and warm-up requests finish, so they are counted"""
+        deadline = time.monotonic() + timeout
+        while self.server.stats.in_flight and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def replay(self, steps: list) -> dict:
+        before = self.server.stats.snapshot()
+        rerun_times = []
+        errors = []
+        for action, argument in steps:
+            # Actions return False when there is nothing to run
+            if not getattr(self, action)(argument):
+                continue
+            start = time.perf_counter()
+            self.run()
+            rerun_times.append(time.perf_counter() - start)
+            errors += [f"{action}: {e.message}" for e in self.at.exception]
+        self.wait_for_background_calls()
+        after = self.server.stats.snapshot()
+
+        return {
+            "reruns": len(rerun_times),
+            "rerun_total": sum(rerun_times),
+            "rerun_p50": statistics.median(rerun_times),
+            "rerun_max": max(rerun_times),
+            "llm_calls": after["requests"] - before["requests"],
+            "bytes_sent": after["bytes_received"] - before["bytes_received"],
+            "bytes_received": after["bytes_sent"] - before["bytes_sent"],
+            "errors": errors,
+        }
+
+
+def run_session(server, name: str, settings: dict, cache_path: str, args) -> dict:
+    memory = not args.no_memory
+    if memory:
+        tracemalloc.start()
+    try:
+        runner = SessionRunner(server, settings, cache_path, args.timeout)
+        result = runner.replay(SESSIONS[name])
+        if memory:
+            result["peak_memory"] = tracemalloc.get_traced_memory()[1]
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return result
+
+
+def parse_settings(pairs: list[str]) -> dict:
+    """Session state overrides like matching_mode=llm or stream_chat=False"""
+    settings = {}
+    for pair in pairs:
+        key, value = pair.split("=", 1)
+        try:
+            settings[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            settings[key] = value
+    return settings
+
+
+def format_bytes(size) -> str:
+    return "–" if size is None else f"{size / 1024:.1f} KiB"
+
+
+def print_report(results: list[dict], baseline: dict = None):
+    header = (
+        f"{'session':<12} {'run':>3} {'reruns':>6} {'total':>9} {'p50':>8} "
+        f"{'max':>8} {'llm':>4} {'sent':>10} {'received':>10} {'peak mem':>11}"
+    )
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['session']:<12} {result['run']:>3} {result['reruns']:>6} "
+            f"{result['rerun_total'] * 1000:>7.0f}ms "
+            f"{result['rerun_p50'] * 1000:>6.0f}ms "
+            f"{result['rerun_max'] * 1000:>6.0f}ms {result['llm_calls']:>4} "
+            f"{format_bytes(result['bytes_sent']):>10} "
+            f"{format_bytes(result['bytes_received']):>10} "
+            f"{format_bytes(result.get('peak_memory')):>11}"
+        )
+        for error in result["errors"]:
+            print(f"    ⚠️ {error}")
+
+    if not baseline:
+        return
+    print("\nChange against the baseline (total rerun time, LLM calls, bytes sent)")
+    previous = {(r["session"], r["run"]): r for r in baseline["results"]}
+    for result in results:
+        before = previous.get((result["session"], result["run"]))
+        if before is None:
+            continue
+
+        def change(key):
+            if not before[key]:
+                return "   n/a"
+            return f"{(result[key] - before[key]) / before[key]:+6.0%}"
+
+        print(
+            f"{result['session']:<12} {result['run']:>3} "
+            f"{change('rerun_total')} {change('llm_calls')} {change('bytes_sent')}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--session", action="append", choices=sorted(SESSIONS), help="default: all"
+    )
+    parser.add_argument("--repeat", type=int, default=2, help="runs per session")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock latency, s")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="session state override, e.g. matching_mode=llm",
+    )
+    parser.add_argument("--timeout", type=float, default=120.0, help="per rerun, s")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc")
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run")
+    args = parser.parse_args()
+
+    server = MockGroqServer(
+        latency=args.latency, tokens_per_second=args.tokens_per_second
+    ).start()
+    os.environ["GROQ_BASE_URL"] = server.base_url
+    # The app reads settings relative to the working directory
+    os.chdir(ROOT)
+
+    settings = parse_settings(args.set)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # A fresh shared cache, so the first run of a session is a cold one
+        cache_path = os.path.join(cache_dir, "benchmark.sqlite")
+        results = []
+        for name in args.session or list(SESSIONS):
+            for run in range(1, args.repeat + 1):
+                result = run_session(server, name, settings, cache_path, args)
+                results.append({"session": name, "run": run, **result})
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+    print_report(results, baseline)
+
+    if args.json:
+        Path(args.json).write_text(
+            json.dumps(
+                {
+                    "latency": args.latency,
+                    "tokens_per_second": args.tokens_per_second,
+                    "settings": settings,
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
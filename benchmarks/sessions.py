@@ -0,0 +1,38 @@
+# benchmarks/sessions.py
+"""Scripted user sessions replayed by benchmarks.run.
+
+Each step is (action, argument):
+    open      page path relative to Home.py, run it
+    option    click the n-th suggested option of the assessment
+    say       send text through the chat input
+    like      like the first n matched professions
+    question  click the n-th suggested question of the liked profession
+    click     click the button with this label
+"""
+
+ASSESSMENT = [
+    ("open", "Home.py"),
+    ("open", "pages/1_Assessment.py"),
+    ("option", 0),
+    ("option", 1),
+    ("say", "I like building things and helping my friends with computers"),
+    ("option", 2),
+]
+
+MATCHES = ASSESSMENT + [
+    ("open", "pages/2_Matching_Professions.py"),
+]
+
+LIKED_CHAT = MATCHES + [
+    ("like", 2),
+    ("open", "pages/3_Liked_Professions.py"),
+    ("question", 0),
+    ("question", 1),
+    ("say", "Is it well paid in the UK?"),
+]
+
+SESSIONS = {
+    "assessment": ASSESSMENT,
+    "matches": MATCHES,
+    "liked_chat": LIKED_CHAT,
+}
@@ -0,0 +1,59 @@
+# chat_memory.py
+import sys
+
+
+class ChatMessage:
+    """One chat message, slotted so it takes a fraction of a dict's memory"""
+
+    __slots__ = ("role", "content", "options", "timestamp")
+
+    def __init__(
+        self,
+        role: str,
+        content: str,
+        options: tuple[str, ...] = None,
+        timestamp: float = None,
+    ):
+        # One copy of each role string, also for messages loaded from JSON
+        self.role = sys.intern(role)
+        self.content = content
+        self.options = tuple(options) if options is not None else None
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"ChatMessage({self.role!r}, {self.content[:40]!r})"
+
+    def to_dict(self) -> dict:
+        data = {"role": self.role, "content": self.content}
+        if self.options is not None:
+            data["options"] = list(self.options)
+        if self.timestamp is not None:
+            data["timestamp"] = self.timestamp
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChatMessage":
+        return cls(
+            data["role"], data["content"], data.get("options"), data.get("timestamp")
+        )
+
+
+def message_size(message: ChatMessage) -> int:
+    """Bytes held by a message, the strings included"""
+    size = sys.getsizeof(message) + sys.getsizeof(message.content)
+    if message.options is not None:
+        size += sys.getsizeof(message.options)
+        size += sum(sys.getsizeof(option) for option in message.options)
+    return size
+
+
+def chat_size(messages: list[ChatMessage]) -> int:
+    return sys.getsizeof(messages) + sum(message_size(m) for m in messages)
+
+
+def dump_chat(messages: list[ChatMessage]) -> list[dict]:
+    return [message.to_dict() for message in messages]
+
+
+def load_chat(data: list[dict]) -> list[ChatMessage]:
+    return [ChatMessage.from_dict(message) for message in data]
@@ -0,0 +1,129 @@
+# context_engine.py
+import streamlit as st
+
+from chat_memory import ChatMessage
+from shared_utils import get_settings
+
+# Defaults for the assessment prompt context, in estimated tokens. Override
+# them in the [context] section of .streamlit/secrets.toml
+DEFAULT_CONTEXT_SETTINGS = {
+    "token_budget": 1200,
+    "aiks_budget": 300,
+    "summary_budget": 300,
+    "recent_messages": 6,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate, good enough for budgeting (~4 chars per token)"""
+    return len(text) // 4 + 1
+
+
+def truncate(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[: max_chars - 1] + "…"
+
+
+def summarize_message(message: ChatMessage) -> str:
+    """Fold one chat message into a single short summary line"""
+    if message.role == "user":
+        return f"- Student: {truncate(message.content, 160)}"
+
+    # Counselor turns are mostly the question, keep its first sentence
+    question = message.content.strip().split("\n")[0]
+    return f"- Counselor asked: {truncate(question, 100)}"
+
+
+class ConversationContext:
+    """Token-budgeted view of the assessment conversation for the prompt.
+
+    Recent messages are included verbatim, older ones are folded one by one
+    into a running summary, so building the context costs the same on every
+    turn no matter how long the conversation is.
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        aiks_budget: int,
+        summary_budget: int,
+        recent_messages: int,
+    ):
+        self.token_budget = token_budget
+        self.aiks_budget = aiks_budget
+        self.summary_budget = summary_budget
+        self.recent_messages = recent_messages
+        self.summary_lines: list[str] = []
+        self.summary_tokens = 0
+        self.omitted = 0
+        self.summarized_upto = 0
+
+    def update(self, chat_history: list[ChatMessage]):
+        """Fold messages that left the recent window into the running summary"""
+        cutoff = len(chat_history) - self.recent_messages
+        for message in chat_history[self.summarized_upto : max(cutoff, 0)]:
+            line = summarize_message(message)
+            self.summary_lines.append(line)
+            self.summary_tokens += estimate_tokens(line)
+        self.summarized_upto = max(self.summarized_upto, cutoff)
+
+        # The AIKS profile keeps the facts, so the oldest lines can go
+        while self.summary_tokens > self.summary_budget and self.summary_lines:
+            self.summary_tokens -= estimate_tokens(self.summary_lines.pop(0))
+            self.omitted += 1
+
+    def render_aiks(self, aiks_data: dict) -> str:
+        """Compact AIKS summary, most recent items first if over budget"""
+        max_chars = self.aiks_budget * 4 // max(len(aiks_data), 1)
+        lines = []
+        for category, items in aiks_data.items():
+            text = ", ".join(reversed(items)) if items else "none yet"
+            lines.append(truncate(f"{category.title()}: {text}", max_chars))
+        return "\n".join(lines)
+
+    def render_history(self, chat_history: list[ChatMessage], budget: int) -> str:
+        self.update(chat_history)
+
+        summary = []
+        if self.omitted:
+            summary.append(f"- ({self.omitted} earlier exchanges omitted)")
+        summary.extend(self.summary_lines)
+
+        # Newest messages first until the budget is spent
+        recent = []
+        budget -= self.summary_tokens
+        for message in reversed(chat_history[self.summarized_upto :]):
+            speaker = "Student" if message.role == "user" else "Counselor"
+            line = f"{speaker}: {message.content.strip()}"
+            budget -= estimate_tokens(line)
+            if budget < 0:
+                break
+            recent.append(line)
+
+        parts = []
+        if summary:
+            parts.append("Earlier in the conversation:\n" + "\n".join(summary))
+        if recent:
+            parts.append("Recent messages:\n" + "\n".join(reversed(recent)))
+        return "\n\n".join(parts) or "No messages yet"
+
+    def render(self, aiks_data: dict, chat_history: list[ChatMessage]) -> dict:
+        """Get the prompt placeholders, within the token budget"""
+        aiks_text = self.render_aiks(aiks_data)
+        history_budget = self.token_budget - estimate_tokens(aiks_text)
+        return {
+            "aiks_data": aiks_text,
+            "chat_history": self.render_history(chat_history, history_budget),
+        }
+
+
+def new_conversation_context() -> ConversationContext:
+    settings = {**DEFAULT_CONTEXT_SETTINGS, **get_settings("context")}
+    return ConversationContext(**settings)
+
+
+def get_conversation_context() -> ConversationContext:
+    """Get the assessment context of the current session"""
+    if "conversation_context" not in st.session_state:
+        st.session_state.conversation_context = new_conversation_context()
+    return st.session_state.conversation_context
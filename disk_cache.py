@@ -0,0 +1,215 @@
+# disk_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+
+from shared_utils import get_settings
+
+# Defaults for the shared caches, override them in the [cache] section
+# of .streamlit/secrets.toml, e.g. professions_ttl = 3600. Backend is
+# "sqlite" (one host) or "redis" (shared by all replicas, needs redis installed)
+DEFAULT_CACHE_SETTINGS = {
+    "backend": "sqlite",
+    "path": ".cache/talent_tracing.sqlite",
+    "redis_url": "redis://localhost:6379/0",
+    "ttl": 7 * 24 * 3600,
+    "max_entries": 1000,
+}
+
+# Prefix of all keys on a shared Redis server
+REDIS_PREFIX = "talent_tracing"
+
+
+def make_cache_key(*parts) -> str:
+    """Build a stable cache key from JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class DiskCache:
+    """Key/value cache in a local SQLite table with TTL and LRU eviction.
+
+    Safe to share between sessions (threads) of one Streamlit process, and
+    between processes on the same host through SQLite file locking.
+    """
+
+    def __init__(self, path: str, table: str, ttl: float, max_entries: int):
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_accessed_at "
+                f"ON {table} (accessed_at)"
+            )
+
+    def get(self, key: str):
+        """Get a cached value, or None if missing or expired"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute(
+                        f"DELETE FROM {self.table} WHERE key = ?", (key,)
+                    )
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+            return row[0]
+
+    def __contains__(self, key: str) -> bool:
+        """Whether a value is cached, not counted as a hit or miss"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl
+
+    def set(self, key: str, value: str):
+        """Store a value and evict expired and least recently used entries"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"""INSERT OR REPLACE INTO {self.table}
+                (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)""",
+                (key, value, now, now),
+            )
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl,)
+            )
+            self._conn.execute(
+                f"""DELETE FROM {self.table} WHERE key IN (
+                    SELECT key FROM {self.table}
+                    ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+
+    def delete(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def __len__(self):
+        with self._lock:
+            (count,) = self._conn.execute(
+                f"SELECT COUNT(*) FROM {self.table}"
+            ).fetchone()
+        return count
+
+
+class RedisCache:
+    """The same cache on a Redis-protocol server, shared by all replicas.
+
+    Values expire through Redis TTLs. A sorted set of access times per cache
+    keeps it to max_entries, evicting the least recently used like DiskCache.
+    """
+
+    def __init__(self, client, table: str, ttl: float, max_entries: int):
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._client = client
+        self._index = f"{REDIS_PREFIX}:{table}:accessed"
+
+    def _key(self, key: str) -> str:
+        return f"{REDIS_PREFIX}:{self.table}:{key}"
+
+    def get(self, key: str):
+        """Get a cached value, or None if missing or expired"""
+        value = self._client.get(self._key(key))
+        if value is None:
+            self.misses += 1
+            return None
+        self._client.zadd(self._index, {key: time.time()})
+        self.hits += 1
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        """Whether a value is cached, not counted as a hit or miss"""
+        return bool(self._client.exists(self._key(key)))
+
+    def set(self, key: str, value: str):
+        """Store a value and evict expired and least recently used entries"""
+        now = time.time()
+        pipe = self._client.pipeline()
+        pipe.set(self._key(key), value, ex=int(self.ttl))
+        pipe.zadd(self._index, {key: now})
+        pipe.zremrangebyscore(self._index, "-inf", now - self.ttl)
+        pipe.zcard(self._index)
+        size = pipe.execute()[-1]
+        if size > self.max_entries:
+            evicted = self._client.zpopmin(self._index, size - self.max_entries)
+            self._client.delete(*(self._key(member) for member, _ in evicted))
+
+    def delete(self, key: str):
+        pipe = self._client.pipeline()
+        pipe.delete(self._key(key))
+        pipe.zrem(self._index, key)
+        pipe.execute()
+
+    def __len__(self):
+        return self._client.zcard(self._index)
+
+
+@st.cache_resource(show_spinner=False)
+def get_redis_client(url: str):
+    """Get a process-wide client, only the redis backend needs the redis package"""
+    import redis
+
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def cache_setting(name: str, key: str):
+    """Get a [cache] setting, overridden per cache name, e.g. answers_ttl"""
+    settings = get_settings("cache")
+    default = settings.get(key, DEFAULT_CACHE_SETTINGS[key])
+    return settings.get(f"{name}_{key}", default)
+
+
+@st.cache_resource(show_spinner=False)
+def get_disk_cache(name: str):
+    """Get a process-wide cache on the configured backend"""
+    if cache_setting(name, "backend") == "redis":
+        return RedisCache(
+            get_redis_client(cache_setting(name, "redis_url")),
+            table=name,
+            ttl=cache_setting(name, "ttl"),
+            max_entries=cache_setting(name, "max_entries"),
+        )
+    return DiskCache(
+        path=cache_setting(name, "path"),
+        table=name,
+        ttl=cache_setting(name, "ttl"),
+        max_entries=cache_setting(name, "max_entries"),
+    )
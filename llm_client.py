@@ -0,0 +1,191 @@
+# llm_client.py
+import asyncio
+import functools
+import queue
+import threading
+
+import streamlit as st
+
+from perf import current_trace_attributes, install_hooks, trace_attributes
+from shared_utils import get_settings
+
+# Defaults for the shared connection pool, override them in the [llm] section
+# of .streamlit/secrets.toml
+DEFAULT_LLM_SETTINGS = {
+    "max_connections": 50,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 60.0,
+    "connect_timeout": 5.0,
+    "timeout": 60.0,
+    "max_retries": 2,
+    "max_concurrency": 8,
+    "output_mode": "json",
+    "output_attempts": 2,
+}
+
+# Structured output modes instructor supports for Groq, by instructor.Mode
+# name. TOOLS constrains the output to the response model schema through
+# function calling. Names, because the LLM stack (instructor, groq and openai
+# under it) is most of a cold start: it is imported with the first client,
+# when the first LLM call is made, rather than when a page loads
+OUTPUT_MODES = {
+    "json": "JSON",
+    "tools": "TOOLS",
+}
+
+
+def get_llm_settings() -> dict:
+    """Get LLM client settings merged with defaults"""
+    return {**DEFAULT_LLM_SETTINGS, **get_settings("llm")}
+
+
+def http_client_options(settings: dict) -> dict:
+    import httpx
+
+    return {
+        "limits": httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive_connections"],
+            keepalive_expiry=settings["keepalive_expiry"],
+        ),
+        "timeout": httpx.Timeout(
+            settings["timeout"], connect=settings["connect_timeout"]
+        ),
+    }
+
+
+@st.cache_resource(show_spinner=False)
+def get_groq_client(groq_api_key: str):
+    """Get a process-wide Groq client with a pooled keep-alive HTTP client"""
+    import httpx
+    from groq import Groq
+
+    settings = get_llm_settings()
+
+    http_client = httpx.Client(**http_client_options(settings))
+
+    return Groq(
+        api_key=groq_api_key,
+        http_client=http_client,
+        max_retries=settings["max_retries"],
+    )
+
+
+def with_output_attempts(client, attempts: int):
+    """Make attempts the default max_retries of every call of an instructor client.
+
+    Outputs that still fail validation after the local repairs in models.py are
+    re-asked until attempts is reached. Instructor has no client-wide setting
+    for it, so the create methods are wrapped.
+    """
+    for name in ("create", "create_partial", "create_iterable"):
+        method = getattr(type(client), name)
+        setattr(client, name, functools.partial(method, client, max_retries=attempts))
+    return client
+
+
+def with_message_copies(client):
+    """Give every call of an instructor client its own copy of the messages.
+
+    Instructor adds the response schema to the messages it is given. Router
+    fallbacks and hedges call again with the same list, and the gateway keys
+    shared requests by it, so the caller's list has to stay as it was built.
+    """
+
+    def copying(method):
+        @functools.wraps(method)
+        def create(*args, messages, **kwargs):
+            messages = [dict(message) for message in messages]
+            return method(*args, messages=messages, **kwargs)
+
+        return create
+
+    for name in ("create", "create_partial", "create_iterable"):
+        setattr(client, name, copying(getattr(client, name)))
+    return client
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm_client(groq_api_key: str):
+    """Get a process-wide instructor client, shared by all sessions and pages"""
+    import instructor
+
+    settings = get_llm_settings()
+    client = instructor.from_groq(
+        get_groq_client(groq_api_key),
+        mode=instructor.Mode[OUTPUT_MODES[settings["output_mode"]]],
+    )
+    client = with_output_attempts(client, settings["output_attempts"])
+    return install_hooks(with_message_copies(client))
+
+
+@st.cache_resource(show_spinner=False)
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Get the process-wide event loop that runs all async LLM requests"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(
+        target=loop.run_forever, name="llm-event-loop", daemon=True
+    ).start()
+    return loop
+
+
+@st.cache_resource(show_spinner=False)
+def get_async_llm_client(groq_api_key: str):
+    """Get a process-wide async instructor client, bound to get_event_loop()"""
+    import httpx
+    import instructor
+    from groq import AsyncGroq
+
+    settings = get_llm_settings()
+    groq_client = AsyncGroq(
+        api_key=groq_api_key,
+        http_client=httpx.AsyncClient(**http_client_options(settings)),
+        max_retries=settings["max_retries"],
+    )
+    client = instructor.from_groq(
+        groq_client, mode=instructor.Mode[OUTPUT_MODES[settings["output_mode"]]]
+    )
+    client = with_output_attempts(client, settings["output_attempts"])
+    return install_hooks(with_message_copies(client))
+
+
+def iterate_as_completed(coroutines: list, max_concurrency: int = None):
+    """Run coroutines on the shared event loop, yield results as they complete.
+
+    At most max_concurrency run at once. Failed coroutines are skipped, the
+    last error is raised only if none of them succeeded. Stopping the
+    iteration early cancels whatever is still running.
+    """
+    loop = get_event_loop()
+    semaphore = asyncio.Semaphore(
+        max_concurrency or get_llm_settings()["max_concurrency"]
+    )
+    results = queue.Queue()
+    attributes = current_trace_attributes()
+
+    async def run(coroutine):
+        # Each task has its own context, keep the caller's session and page
+        trace_attributes.set(attributes)
+        try:
+            async with semaphore:
+                results.put((True, await coroutine))
+        except Exception as e:
+            results.put((False, e))
+
+    futures = [asyncio.run_coroutine_threadsafe(run(c), loop) for c in coroutines]
+    error = None
+    succeeded = 0
+    try:
+        for _ in futures:
+            ok, value = results.get()
+            if ok:
+                succeeded += 1
+                yield value
+            else:
+                error = value
+    finally:
+        for future in futures:
+            future.cancel()
+
+    if error is not None and not succeeded:
+        raise error
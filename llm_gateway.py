@@ -0,0 +1,345 @@
+# llm_gateway.py
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future
+from contextvars import ContextVar
+
+import streamlit as st
+
+from disk_cache import make_cache_key
+from model_router import get_model_router
+from perf import current_call
+from shared_utils import get_settings
+
+# Defaults for the shared rate limit, override them in the [gateway] section
+# of .streamlit/secrets.toml. Limits are per model like Groq's, 0 turns one off
+DEFAULT_GATEWAY_SETTINGS = {
+    "requests_per_minute": 30,
+    "tokens_per_minute": 15_000,
+    "completion_tokens": 500,
+    "history": 500,
+}
+
+# Waiting requests are let through lowest first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Priority of the LLM calls made in the current thread or asyncio task
+request_priority: ContextVar[int] = ContextVar("request_priority", default=INTERACTIVE)
+
+
+def background(fn):
+    """Wrap fn so its LLM calls queue behind the ones users are waiting for"""
+
+    def run(*args, **kwargs):
+        token = request_priority.set(BACKGROUND)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            request_priority.reset(token)
+
+    return run
+
+
+def estimate_tokens(messages) -> int:
+    """Rough prompt size, about four characters per token"""
+    return sum(len(message["content"]) for message in messages) // 4
+
+
+def estimate_output_tokens(items: list) -> int:
+    """Rough size of a streamed response, usage isn't reported for streams"""
+    return sum(len(item.model_dump_json()) for item in items) // 4
+
+
+class TokenBucket:
+    """Refills per_minute units evenly over a minute, holds a minute's worth"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until amount is available, more than capacity waits for a full bucket"""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(min(amount, self.capacity) - self.level, 0) / self.rate
+
+    def take(self, amount: float):
+        # Can go below zero, when a request turned out bigger than estimated
+        self.level -= amount
+
+
+class RateLimiter:
+    """Request and token buckets of one model, with a queue of waiting requests.
+
+    Requests are let through strictly by (priority, arrival), so a burst of
+    prefetches can't get ahead of a turn a user is waiting for.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._waiting = []  # Heap of [priority, arrival] tickets
+        self._cond = threading.Condition()
+
+    def _delay(self, tokens: int) -> float:
+        now = time.monotonic()
+        delays = [
+            bucket.delay(amount, now)
+            for bucket, amount in ((self.requests, 1), (self.tokens, tokens))
+            if bucket is not None
+        ]
+        return max(delays, default=0.0)
+
+    def acquire(self, ticket: list, tokens: int):
+        """Block until the ticket is first in line and the buckets allow it"""
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                if self._waiting[0] is not ticket:
+                    self._cond.wait()
+                    continue
+                delay = self._delay(tokens)
+                if delay <= 0:
+                    break
+                self._cond.wait(delay)
+            heapq.heappop(self._waiting)
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(tokens)
+            self._cond.notify_all()
+
+    def promote(self, ticket: list, priority: int):
+        with self._cond:
+            if priority < ticket[0]:
+                ticket[0] = priority
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def correct(self, tokens: int):
+        """Take the difference between the used and the estimated tokens"""
+        if self.tokens is not None:
+            with self._cond:
+                self.tokens.take(tokens)
+
+
+class Flight:
+    """One request on its way to the API, shared by everyone asking for it"""
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.future = Future()
+        self.limiter = None
+        self.ticket = None
+
+
+class LLMGateway:
+    """The single way to Groq for all sessions of the process.
+
+    Identical requests already in flight are made once and the result is
+    shared (single flight). Every request, including router fallbacks,
+    waits for the rate limit of its model in priority order.
+    """
+
+    def __init__(self, router, settings: dict):
+        self.router = router
+        self.settings = settings
+        self.coalesced = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.waits = deque(maxlen=settings["history"])  # (priority, seconds)
+        self._limiters: dict[str, RateLimiter] = {}
+        self._flights: dict[str, Flight] = {}
+        self._arrivals = itertools.count()
+        self._lock = threading.Lock()
+
+    def limiter(self, model: str) -> RateLimiter:
+        with self._lock:
+            if model not in self._limiters:
+                self._limiters[model] = RateLimiter(
+                    self.settings["requests_per_minute"],
+                    self.settings["tokens_per_minute"],
+                )
+            return self._limiters[model]
+
+    def wait_times(self, priority: int) -> list[float]:
+        return [seconds for p, seconds in list(self.waits) if p == priority]
+
+    def _admit(self, flight: Flight, model: str, tokens: int) -> RateLimiter:
+        limiter = self.limiter(model)
+        with self._lock:
+            ticket = [flight.priority, next(self._arrivals)]
+            flight.limiter, flight.ticket = limiter, ticket
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        start = time.monotonic()
+        try:
+            limiter.acquire(ticket, tokens)
+        finally:
+            with self._lock:
+                self.queued -= 1
+        waited = time.monotonic() - start
+        self.waits.append((ticket[0], waited))
+        if (call := current_call.get()) is not None:
+            call.queued += waited
+        return limiter
+
+    def _correct(self, limiter: RateLimiter, estimate: int, call=None):
+        call = call or current_call.get()
+        if call is not None and call.prompt_tokens is not None:
+            used = call.prompt_tokens + (call.completion_tokens or 0)
+            limiter.correct(used - estimate)
+
+    def _limited(self, fn, flight: Flight, messages):
+        """Wrap fn(model) to wait for the model's rate limit first"""
+        estimate = estimate_tokens(messages) + self.settings["completion_tokens"]
+
+        def run(model):
+            limiter = self._admit(flight, model, estimate)
+            result = fn(model)
+            self._correct(limiter, estimate)
+            return result
+
+        return run
+
+    def _limited_stream(self, fn, flight: Flight, messages):
+        """_limited() for streams, charging the tokens once the stream is read"""
+        prompt = estimate_tokens(messages)
+        estimate = prompt + self.settings["completion_tokens"]
+
+        def run(model):
+            limiter = self._admit(flight, model, estimate)
+            call = current_call.get()
+            iterator = iter(fn(model))
+
+            def charged():
+                items = []
+                try:
+                    for item in iterator:
+                        # Partial responses repeat everything before them,
+                        # items of an iterable don't
+                        if items and type(item).__name__.startswith("Partial"):
+                            items[-1] = item
+                        else:
+                            items.append(item)
+                        yield item
+                finally:
+                    if call is not None and call.prompt_tokens is not None:
+                        self._correct(limiter, estimate, call)
+                    else:
+                        used = prompt + estimate_output_tokens(items)
+                        limiter.correct(used - estimate)
+
+            return charged()
+
+        return run
+
+    def _alimited(self, afn, flight: Flight, messages):
+        estimate = estimate_tokens(messages) + self.settings["completion_tokens"]
+
+        async def run(model):
+            # Waiting happens in a worker thread, the event loop is shared
+            limiter = await asyncio.to_thread(self._admit, flight, model, estimate)
+            result = await afn(model)
+            self._correct(limiter, estimate)
+            return result
+
+        return run
+
+    def _join(self, key: str, priority: int) -> tuple[Flight, bool]:
+        """Get the flight for key, and whether the caller has to make the request"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight(priority)
+                return flight, True
+            self.coalesced += 1
+            promote = priority < flight.priority
+            if promote:
+                flight.priority = priority
+            limiter, ticket = flight.limiter, flight.ticket
+        # A user now waits for a background request, move it up the queue
+        if promote and limiter is not None:
+            limiter.promote(ticket, priority)
+        return flight, False
+
+    def _land(self, key: str, flight: Flight, result=None, error=None):
+        with self._lock:
+            del self._flights[key]
+        if error is None:
+            flight.future.set_result(result)
+        elif isinstance(error, Exception):
+            flight.future.set_exception(error)
+        else:
+            # The leader was stopped, the next caller takes over
+            flight.future.cancel()
+
+    def call(self, task: str, fn, model: str, messages, response_model):
+        """router.call() behind the rate limit, sharing identical requests"""
+        key = make_cache_key(task, model, messages, response_model.__name__)
+        while True:
+            flight, leader = self._join(key, request_priority.get())
+            if leader:
+                break
+            try:
+                # A private copy, callers may change their result
+                return flight.future.result().model_copy(deep=True)
+            except CancelledError:
+                continue
+
+        try:
+            result = self.router.call(task, self._limited(fn, flight, messages), model)
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, result)
+        return result
+
+    async def acall(self, task: str, afn, model: str, messages, response_model):
+        """Async call(), for router.acall()"""
+        key = make_cache_key(task, model, messages, response_model.__name__)
+        while True:
+            flight, leader = self._join(key, request_priority.get())
+            if leader:
+                break
+            try:
+                result = await asyncio.wrap_future(flight.future)
+                return result.model_copy(deep=True)
+            except asyncio.CancelledError:
+                if not flight.future.cancelled():
+                    raise
+
+        try:
+            result = await self.router.acall(
+                task, self._alimited(afn, flight, messages), model
+            )
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, result)
+        return result
+
+    def stream(self, task: str, fn, model: str, messages):
+        """router.stream() behind the rate limit, streams are never shared"""
+        flight = Flight(request_priority.get())
+        return self.router.stream(
+            task, self._limited_stream(fn, flight, messages), model
+        )
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm_gateway() -> LLMGateway:
+    """Get the process-wide gateway all LLM calls go through"""
+    return LLMGateway(
+        get_model_router(), {**DEFAULT_GATEWAY_SETTINGS, **get_settings("gateway")}
+    )
@@ -0,0 +1,304 @@
+# model_router.py
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import streamlit as st
+
+from perf import LLMCall, percentile, track_llm_call
+from shared_utils import AUTO_MODEL, get_settings
+
+# Models per tier, in order of preference. All of them are in shared_utils.MODELS
+MODEL_TIERS = {
+    "small": [
+        "llama-3.2-11b-text-preview",
+        "llama3-8b-8192",
+        "llama-3.2-11b-vision-preview",
+        "llama-3.2-3b-preview",
+        "llama-3.2-1b-preview",
+    ],
+    "large": [
+        "llama-3.2-90b-text-preview",
+        "llama3-70b-8192",
+        "llama-3.2-90b-vision-preview",
+    ],
+}
+
+# Short follow-up questions and lists of profession titles don't need a large
+# model, profession matches and career answers do
+TASK_TIERS = {
+    "assessment": "small",
+    "titles": "small",
+    "professions": "large",
+    "chat": "large",
+}
+
+# Defaults for routing, override them in the [router] section of
+# .streamlit/secrets.toml
+DEFAULT_ROUTER_SETTINGS = {
+    "window": 50,
+    "failure_threshold": 3,
+    "cooldown": 30.0,
+    "hedge": False,
+    "hedge_min_samples": 20,
+}
+
+
+@functools.cache
+def retryable_errors() -> tuple:
+    """Errors worth trying another model for, the rest are raised right away"""
+    # Only needed once a call failed, the LLM stack is loaded by then
+    import groq
+    import httpx
+
+    return (
+        groq.RateLimitError,
+        groq.APIConnectionError,
+        groq.InternalServerError,
+        httpx.TimeoutException,
+    )
+
+
+def unwrap_error(error: Exception) -> Exception:
+    """Get the API error instructor wrapped into its retry exception"""
+    from instructor.exceptions import InstructorRetryException
+
+    if isinstance(error, InstructorRetryException) and error.args:
+        if isinstance(error.args[0], Exception):
+            return error.args[0]
+    return error
+
+
+def is_retryable(error: Exception) -> bool:
+    return isinstance(unwrap_error(error), retryable_errors())
+
+
+def elapsed(start: float, call: LLMCall) -> float:
+    """Time the model took, without waiting in the gateway queue"""
+    return time.monotonic() - start - call.queued
+
+
+class ModelStats:
+    """Rolling latency and error rate of one model, with a circuit breaker"""
+
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def percentile(self, q: float):
+        return percentile(self.latencies, q)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def is_open(self, now: float) -> bool:
+        return now < self.open_until
+
+
+class ModelRouter:
+    """Picks a model per task and falls back when a model is slow or failing.
+
+    A model's circuit opens after failure_threshold retryable failures in a
+    row (429s, timeouts, 5xx) and it is skipped for cooldown seconds. With
+    hedging on, a request still running after the model's p95 latency is
+    also sent to the next model, and the first answer wins.
+    """
+
+    def __init__(self, settings: dict):
+        self.settings = settings
+        self._stats: dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(thread_name_prefix="hedge")
+
+    def stats(self, model: str) -> ModelStats:
+        with self._lock:
+            if model not in self._stats:
+                self._stats[model] = ModelStats(self.settings["window"])
+            return self._stats[model]
+
+    def record(self, model: str, latency: float, error: Exception = None):
+        stats = self.stats(model)
+        with self._lock:
+            stats.outcomes.append(error is None)
+            if error is None:
+                stats.latencies.append(latency)
+                stats.consecutive_failures = 0
+                stats.open_until = 0.0
+            elif is_retryable(error):
+                stats.consecutive_failures += 1
+                if stats.consecutive_failures >= self.settings["failure_threshold"]:
+                    stats.open_until = time.monotonic() + self.settings["cooldown"]
+
+    def route(self, task: str, model: str = AUTO_MODEL) -> list[str]:
+        """Get the models to try for a task, best first.
+
+        Models of the task's tier are ranked by latency among themselves,
+        other tiers are only the fallback when the tier's circuits are open.
+        A chosen model goes first while its circuit is closed.
+        """
+        tier = TASK_TIERS[task]
+        groups = [[model] if model != AUTO_MODEL else [], MODEL_TIERS[tier]]
+        groups += [models for name, models in MODEL_TIERS.items() if name != tier]
+        chain = []  # (group, position in the group, model)
+        seen = set()
+        for group, models in enumerate(groups):
+            models = [m for m in models if m not in seen]
+            seen.update(models)
+            chain += [(group, position, m) for position, m in enumerate(models)]
+
+        now = time.monotonic()
+
+        def rank(entry):
+            group, position, candidate = entry
+            stats = self.stats(candidate)
+            p50 = stats.percentile(0.5)
+            return (
+                stats.is_open(now),
+                group,
+                # The preferred model leads until others in its tier proved faster
+                p50 if p50 is not None else (0.0 if position == 0 else float("inf")),
+            )
+
+        return [candidate for _, _, candidate in sorted(chain, key=rank)]
+
+    def _timed_call(self, task: str, fn, model: str):
+        start = time.monotonic()
+        try:
+            with track_llm_call(task, model) as call:
+                result = fn(model)
+                call.response_model = type(result).__name__
+        except Exception as e:
+            self.record(model, elapsed(start, call), e)
+            raise
+        self.record(model, elapsed(start, call))
+        return result
+
+    def _hedge_deadline(self, model: str):
+        stats = self.stats(model)
+        if not self.settings["hedge"]:
+            return None
+        if len(stats.latencies) < self.settings["hedge_min_samples"]:
+            return None
+        return stats.percentile(0.95)
+
+    def _hedged_call(self, task: str, fn, primary: str, backup: str, deadline: float):
+        def submit(model):
+            # In a copy of the caller's context, for its session, page and
+            # request priority
+            context = contextvars.copy_context()
+            return self._executor.submit(context.run, self._timed_call, task, fn, model)
+
+        futures = [submit(primary)]
+        done, _ = wait(futures, timeout=deadline)
+        if not done:
+            futures.append(submit(backup))
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower request finishes in the background and is ignored
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, task: str, fn, model: str = AUTO_MODEL):
+        """Call fn(model) with the best model for task, falling back on failures"""
+        candidates = self.route(task, model)
+        error = None
+        for idx, candidate in enumerate(candidates):
+            deadline = self._hedge_deadline(candidate)
+            try:
+                if deadline is not None and idx + 1 < len(candidates):
+                    return self._hedged_call(
+                        task, fn, candidate, candidates[idx + 1], deadline
+                    )
+                return self._timed_call(task, fn, candidate)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                error = e
+        raise error
+
+    async def acall(self, task: str, afn, model: str = AUTO_MODEL):
+        """Async call(), without hedging: await afn(model) with fallback"""
+        error = None
+        for candidate in self.route(task, model):
+            start = time.monotonic()
+            try:
+                with track_llm_call(task, candidate) as call:
+                    result = await afn(candidate)
+                    call.response_model = type(result).__name__
+            except Exception as e:
+                self.record(candidate, elapsed(start, call), e)
+                if not is_retryable(e):
+                    raise
+                error = e
+                continue
+            self.record(candidate, elapsed(start, call))
+            return result
+        raise error
+
+    def stream(self, task: str, fn, model: str = AUTO_MODEL):
+        """Iterate fn(model) with the best model for task.
+
+        Falls back to the next model only while nothing was yielded yet, the
+        latency recorded for streams is the time to the first item.
+        """
+        error = None
+        for candidate in self.route(task, model):
+            start = time.monotonic()
+            call = LLMCall(task=task, model=candidate)
+            try:
+                with call.active():
+                    iterator = iter(fn(candidate))
+                    first = next(iterator)
+            except StopIteration:
+                self.record(candidate, elapsed(start, call))
+                call.finish()
+                return
+            except Exception as e:
+                self.record(candidate, elapsed(start, call), e)
+                call.finish(e)
+                if not is_retryable(e):
+                    raise
+                error = e
+                continue
+
+            self.record(candidate, elapsed(start, call))
+            call.first_token()
+            call.response_model = type(first).__name__
+            try:
+                yield first
+                while True:
+                    with call.active():
+                        item = next(iterator, StopIteration)
+                    if item is StopIteration:
+                        break
+                    yield item
+            except GeneratorExit:
+                # The consumer stopped early, that is not a failure
+                call.finish()
+                raise
+            except BaseException as e:
+                call.finish(e)
+                raise
+            call.finish()
+            return
+        raise error
+
+
+@st.cache_resource(show_spinner=False)
+def get_model_router() -> ModelRouter:
+    """Get the process-wide router, its statistics are shared by all sessions"""
+    return ModelRouter({**DEFAULT_ROUTER_SETTINGS, **get_settings("router")})
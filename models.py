@@ -1,29 +1,107 @@
-from pydantic import BaseModel
-from typing import List, Dict
+import json
+import re
+from typing import Annotated, Dict, List
+
+from pydantic import BaseModel, BeforeValidator, Field
+
+from perf import record_repair
+
+
+# Local repairs of common model output defects, so they don't cost a re-ask
+
+
+def split_items(value):
+    """Lists sometimes come back as one comma separated string"""
+    if isinstance(value, str):
+        record_repair("list as string")
+        return [item.strip() for item in re.split(r"[,;\n]", value) if item.strip()]
+    return value
+
+
+def parse_alignment(value):
+    """Alignment sometimes comes back as a JSON string or "Category: a, b" lines"""
+    if isinstance(value, str):
+        record_repair("alignment as string")
+        try:
+            value = json.loads(value)
+        except ValueError:
+            alignment = {}
+            for line in re.split(r"[;\n]", value):
+                category, separator, items = line.partition(":")
+                if separator and category.strip():
+                    alignment[category.strip().lower()] = items
+            value = alignment
+    if isinstance(value, dict):
+        return {str(category): split_items(items) for category, items in value.items()}
+    return value
+
+
+ItemList = Annotated[List[str], BeforeValidator(split_items)]
+Alignment = Annotated[Dict[str, List[str]], BeforeValidator(parse_alignment)]
 
 
 class AIKSUpdate(BaseModel):
-    abilities: List[str] = []
-    interests: List[str] = []
-    knowledge: List[str] = []
-    skills: List[str] = []
-    suggested_options: List[str] = []
+    abilities: ItemList = []
+    interests: ItemList = []
+    knowledge: ItemList = []
+    skills: ItemList = []
+    suggested_options: ItemList = []
 
 
 class AssessmentResponse(BaseModel):
     next_question: str
-    analysis: str
-    aiks_updates: AIKSUpdate
-    suggested_options: List[str]
+    analysis: str = ""
+    aiks_updates: AIKSUpdate = Field(default_factory=AIKSUpdate)
+    suggested_options: ItemList = []
 
 
 class Profession(BaseModel):
     title: str
     explanation: str
-    required_skills: List[str]
-    aiks_alignment: Dict[str, List[str]]
+    required_skills: ItemList = []
+    aiks_alignment: Alignment = {}
     daily_life_example: str
 
 
 class ProfessionResponse(BaseModel):
     professions: List[Profession]
+
+
+class Occupation(BaseModel):
+    title: str
+    description: str
+    skills: List[str]
+    daily_life_example: str
+
+
+class ProfessionDetails(BaseModel):
+    title: str
+    daily_life_example: str
+    aiks_alignment: Alignment = {}
+
+
+class ProfessionDetailsResponse(BaseModel):
+    professions: List[ProfessionDetails]
+
+
+class ProfessionTitles(BaseModel):
+    titles: ItemList
+
+
+class ChatResponse(BaseModel):
+    """Model for career advice chat responses"""
+
+    content: str
+    tone: str = "friendly"
+    focus_areas: list[str] = []
+
+
+class DossierAnswer(BaseModel):
+    question: str
+    answer: str
+
+
+class ProfessionDossier(BaseModel):
+    """Answers to all suggested questions about a profession, in one response"""
+
+    answers: List[DossierAnswer]
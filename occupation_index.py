@@ -0,0 +1,88 @@
+# occupation_index.py
+import json
+from pathlib import Path
+
+import numpy as np
+import streamlit as st
+
+from aiks_profile import canonicalize
+from models import Occupation, Profession
+from text_similarity import TfidfVectorizer
+
+CATALOG_PATH = Path(__file__).parent / "data" / "occupations.json"
+
+
+def occupation_text(occupation: Occupation) -> str:
+    return " ".join([occupation.title, occupation.description, *occupation.skills])
+
+
+def profile_items(aiks_data) -> list[str]:
+    return [item for items in aiks_data.values() for item in items]
+
+
+class OccupationIndex:
+    """Bundled occupation catalog with a TF-IDF matrix for cosine search"""
+
+    def __init__(self, occupations: list[Occupation]):
+        self.occupations = occupations
+        self.vectorizer = TfidfVectorizer(
+            [occupation_text(occupation) for occupation in occupations]
+        )
+        self._rows = {
+            canonicalize(occupation.title): row
+            for row, occupation in enumerate(occupations)
+        }
+
+    def get(self, title: str):
+        """Get a catalog occupation by title, or None"""
+        row = self._rows.get(canonicalize(title))
+        return None if row is None else self.occupations[row]
+
+    def search(self, aiks_data, top_k: int = 8) -> list[tuple[Occupation, float]]:
+        """Get the occupations closest to the AIKS profile, best first"""
+        query = self.vectorizer.transform([" ".join(profile_items(aiks_data))])[0]
+        scores = self.vectorizer.matrix @ query
+        top = np.argsort(-scores, kind="stable")[:top_k]
+        return [(self.occupations[row], float(scores[row])) for row in top]
+
+    def align(self, occupation: Occupation, aiks_data) -> dict[str, list[str]]:
+        """Profile items that share vocabulary with the occupation, per category"""
+        row = self._rows[canonicalize(occupation.title)]
+        occupation_vector = self.vectorizer.matrix[row]
+        alignment = {}
+        for category, items in aiks_data.items():
+            if not items:
+                continue
+            similarities = self.vectorizer.transform(items) @ occupation_vector
+            matched = [item for item, sim in zip(items, similarities) if sim > 0]
+            if matched:
+                alignment[category] = matched
+        return alignment
+
+    def to_profession(
+        self, occupation: Occupation, aiks_data, details=None
+    ) -> Profession:
+        """Build a profession card from the catalog, with optional LLM details"""
+        return Profession(
+            title=occupation.title,
+            explanation=occupation.description,
+            required_skills=occupation.skills,
+            aiks_alignment=(
+                details.aiks_alignment
+                if details is not None
+                else self.align(occupation, aiks_data)
+            ),
+            daily_life_example=(
+                details.daily_life_example
+                if details is not None
+                else occupation.daily_life_example
+            ),
+        )
+
+
+@st.cache_resource(show_spinner=False)
+def get_occupation_index() -> OccupationIndex:
+    """Load the catalog and build its vector index once per process"""
+    with open(CATALOG_PATH, encoding="utf-8") as f:
+        occupations = [Occupation(**row) for row in json.load(f)]
+    return OccupationIndex(occupations)
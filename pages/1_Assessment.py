@@ -1,74 +1,121 @@
 import streamlit as st
-import instructor
-from groq import Groq
 import time
-from models import AssessmentResponse
-from shared_utils import init_session_state, render_sidebar
+from assessment import (
+    INITIAL_OPTIONS,
+    INITIAL_PROMPT,
+    build_assessment_messages,
+    fetch_assessment,
+    get_warm_start_cache,
+)
+from chat_memory import ChatMessage
+from context_engine import get_conversation_context
+from llm_client import get_llm_client
+from perf import section, timed_rerun
+from session_store import mark_dirty, persisted_session
+from speculation import get_prefetcher
+from shared_utils import init_session_state, render_sidebar, visible_messages
 
 
 st.set_page_config(page_icon="📝", page_title="Career Assessment", layout="centered")
 
 
-def get_llm_response(user_input, groq_api_key):
-    client = instructor.from_groq(Groq(api_key=groq_api_key), mode=instructor.Mode.JSON)
+def build_current_messages(user_input, chat_history) -> list[dict]:
+    """Build the next turn messages from this session's profile and context"""
+    return build_assessment_messages(
+        user_input,
+        st.session_state.aiks_data,
+        chat_history,
+        get_conversation_context(),
+    )
+
+
+def prefetch_options(options, message_timestamp, groq_api_key):
+    """Speculatively request the reply for every suggested option"""
+    client = get_llm_client(groq_api_key)
+    prefetcher = get_prefetcher()
+    warm_start_cache = get_warm_start_cache(groq_api_key)
+    for option in options:
+        # First-turn replies are already served by the warm start cache
+        if (
+            len(st.session_state.chat_history) == 1
+            and (st.session_state.model, option) in warm_start_cache
+        ):
+            continue
+        prefetcher.prefetch(
+            (message_timestamp, option, st.session_state.model),
+            fetch_assessment,
+            client,
+            st.session_state.model,
+            build_current_messages(option, st.session_state.chat_history),
+        )
 
-    system_prompt = """You are a friendly career guidance counselor conducting an assessment with a teenager. 
-    Your goal is to gather information about their Abilities, Interests, Knowledge, and Skills (AIKS).
 
-    Guidelines:
-    1. Ask engaging questions that are easy for teens to answer
-    2. Always provide 2-5 example options they can choose from, don't suggest "Other" vague options, it must be copy-pastable
-    3. Keep the tone casual and encouraging
-    4. Acknowledge and build upon their previous answers
-    5. Use examples and scenarios teens can relate to
+def get_warm_response(user_input, groq_api_key):
+    """Get the shared reply for an initial option if the conversation just started"""
+    is_first_turn = len(st.session_state.chat_history) == 2 and not any(
+        st.session_state.aiks_data.values()
+    )
+    if not is_first_turn or user_input not in INITIAL_OPTIONS:
+        return None
+    return get_warm_start_cache(groq_api_key).get(st.session_state.model, user_input)
 
-    Current AIKS Data:
-    {aiks_data}
 
-    Chat History:
-    {chat_history}"""
+def get_llm_response(user_input, groq_api_key, speculative_key=None):
+    # Pick up the speculative request for a clicked option, if there is one
+    prefetched = get_prefetcher().take(speculative_key) if speculative_key else None
+
+    response = get_warm_response(user_input, groq_api_key)
+    if response is not None:
+        return response
 
     with st.status("Thinking about your response...", expanded=True) as status:
         status.update(label="Analyzing your interests...")
-        response = client.chat.completions.create(
-            model=st.session_state.model,
-            response_model=AssessmentResponse,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_input},
-            ],
-            temperature=0.7,
-        )
+        if prefetched is not None and prefetched.done() and not prefetched.cancelled():
+            try:
+                response = prefetched.result()
+            except Exception:
+                # A failed speculation is retried as a regular request
+                response = None
+        if response is None:
+            # A speculation still in flight is joined by the same request
+            # through the gateway, which moves it ahead of background work
+            if prefetched is not None:
+                prefetched.cancel()
+            response = fetch_assessment(
+                get_llm_client(groq_api_key),
+                st.session_state.model,
+                # The user message is already the last one in the history
+                build_current_messages(user_input, st.session_state.chat_history[:-1]),
+            )
         status.update(label="Preparing suggestions...", state="complete")
 
     return response
 
 
-def process_user_input(user_input):
+def process_user_input(user_input, speculative_key=None):
+    mark_dirty("chat_history", "aiks_data")
+
     # Add user message to chat history first for immediate feedback
     st.session_state.chat_history.append(
-        {"role": "user", "content": user_input, "timestamp": time.time()}
+        ChatMessage("user", user_input, timestamp=time.time())
     )
 
     # Get LLM response
-    response = get_llm_response(user_input, st.secrets["groq"]["api_key"])
-
-    # Update AIKS data
-    for category, items in response.aiks_updates.dict().items():
-        if category != "suggested_options":
-            st.session_state.aiks_data[category].extend(items)
-            st.session_state.aiks_data[category] = list(
-                set(st.session_state.aiks_data[category])
-            )
+    response = get_llm_response(
+        user_input, st.secrets["groq"]["api_key"], speculative_key
+    )
+
+    # Update AIKS data, the profile drops duplicates and keeps the order
+    st.session_state.aiks_data.merge(response.aiks_updates.model_dump())
 
     # Add assistant response to chat history
     st.session_state.chat_history.append(
-        {
-            "role": "assistant",
-            "content": response.next_question,
-            "options": response.suggested_options,
-            "timestamp": time.time(),
-        }
+        ChatMessage(
+            "assistant",
+            response.next_question,
+            response.suggested_options,
+            time.time(),
+        )
     )
 
     st.session_state.current_question += 1
@@ -112,10 +159,55 @@ def render_suggested_options(options, message_timestamp, container):
     return None
 
 
+@st.fragment
+def render_chat_history():
+    """Render the chat window, a fragment so paging back reruns only the chat"""
+    # Display the recent chat history
+    chat_history = st.session_state.chat_history
+    for message in visible_messages(chat_history, "chat_history"):
+        is_last_message = message is chat_history[-1]
+
+        if message.role == "user":
+            with st.chat_message("user", avatar="👤"):
+                st.write(message.content)
+        else:
+            with st.chat_message("assistant", avatar="🧑‍💼"):
+                st.write(message.content)
+                # Show suggested options only for the last assistant message
+                if message.options is not None and is_last_message:
+                    message_timestamp = message.timestamp or time.time()
+                    if st.session_state.speculative_prefetch:
+                        prefetch_options(
+                            message.options,
+                            message_timestamp,
+                            st.secrets["groq"]["api_key"],
+                        )
+
+                    selected_option = render_suggested_options(
+                        message.options,
+                        message_timestamp,
+                        st.container(),
+                    )
+                    if selected_option:
+                        process_user_input(
+                            selected_option,
+                            (
+                                message_timestamp,
+                                selected_option,
+                                st.session_state.model,
+                            ),
+                        )
+                        # A full rerun, the profile in the sidebar changed too
+                        st.rerun()
+
+
 def main():
     init_session_state()
     render_sidebar()
 
+    # Keep the first-turn replies warm for the model this session uses
+    get_warm_start_cache(st.secrets["groq"]["api_key"]).warm_up(st.session_state.model)
+
     st.title("📝 Career Assessment")
     st.write("""Let's have a casual chat about what interests you! Feel free to share as much or as little as you're comfortable with.
     You can move to viewing career matches at any time.""")
@@ -123,59 +215,28 @@ def main():
     # Chat container for message history
     chat_container = st.container()
 
-    with chat_container:
-        # Display chat history
-        for idx, message in enumerate(st.session_state.chat_history):
-            is_last_message = idx == len(st.session_state.chat_history) - 1
-
-            if message["role"] == "user":
-                with st.chat_message("user", avatar="👤"):
-                    st.write(message["content"])
-            else:
-                with st.chat_message("assistant", avatar="🧑‍💼"):
-                    st.write(message["content"])
-                    # Show suggested options only for the last assistant message
-                    if "options" in message and is_last_message:
-                        selected_option = render_suggested_options(
-                            message["options"],
-                            message.get("timestamp", time.time()),
-                            st.container(),
-                        )
-                        if selected_option:
-                            process_user_input(selected_option)
-                            st.rerun()
+    with section("chat history"), chat_container:
+        render_chat_history()
 
     # Chat input
     if prompt := st.chat_input(
         "Type your answer or choose from the suggestions above..."
     ):
-        process_user_input(prompt)
+        # A typed answer makes all speculative replies useless
+        get_prefetcher().discard()
+        with section("user input"):
+            process_user_input(prompt)
         st.rerun()
 
     # Initialize chat with first question if empty
     if not st.session_state.chat_history:
-        initial_prompt = """Hi! 👋 I'm your career guidance counselor. I'd love to learn more about you 
-        to help find careers that match your interests and strengths. 
-        Let's start with your interests! What do you enjoy the most?
-        Here are some examples:
-        """
-
+        mark_dirty("chat_history")
         st.session_state.chat_history.append(
-            {
-                "role": "assistant",
-                "content": initial_prompt,
-                "options": [
-                    "I like building, fixing, or working with my hands",
-                    "I enjoy solving problems and learning how things work",
-                    "I love creating art, music, or writing",
-                    "I like helping, teaching, or supporting others",
-                    "I'm interested in leading, managing, or starting projects",
-                ],
-                "timestamp": time.time(),
-            }
+            ChatMessage("assistant", INITIAL_PROMPT, INITIAL_OPTIONS, time.time())
         )
         st.rerun()
 
 
 if __name__ == "__main__":
-    main()
+    with timed_rerun("Assessment"), persisted_session():
+        main()
@@ -1,20 +1,39 @@
 import streamlit as st
-import instructor
-from groq import Groq
-from models import ProfessionResponse
-from shared_utils import init_session_state, render_sidebar
+from models import (
+    Profession,
+    ProfessionDetails,
+    ProfessionDetailsResponse,
+    ProfessionResponse,
+    ProfessionTitles,
+)
+from disk_cache import get_disk_cache, make_cache_key
+from llm_client import get_async_llm_client, get_llm_client, iterate_as_completed
+from llm_gateway import get_llm_gateway
+from aiks_profile import canonical_profile, canonicalize
+from occupation_index import get_occupation_index
+from perf import section, timed_rerun
+from profession_chat import discard_dossier, start_dossier
+from profession_scoring import get_profession_scores
+from session_store import mark_dirty, persisted_session
+from shared_utils import get_settings, init_session_state, render_sidebar
 
 st.set_page_config(page_icon="💼", page_title="Matching Professions", layout="centered")
 
 
-def generate_professions(groq_api_key):
-    # Check if we already have professions generated
-    if "generated_professions" in st.session_state:
-        return st.session_state.generated_professions
+def profession_ask(count: int = None) -> str:
+    if count is None:
+        return (
+            "suggest the top 5-10 professions "
+            "that would be most fulfilling for this person"
+        )
+    return f"suggest {count} more professions that would be fulfilling for this person"
 
-    client = instructor.from_groq(Groq(api_key=groq_api_key), mode=instructor.Mode.JSON)
 
-    aiks_data = st.session_state.aiks_data
+def build_profession_messages(
+    aiks_data: dict, ask: str = None, exclude_titles=()
+) -> list[dict]:
+    """Build the prompt messages for profession generation"""
+    ask = ask or profession_ask()
     aiks_summary = "\n".join(
         [
             f"{category.title()}: " + ", ".join(items)
@@ -22,36 +41,369 @@ def generate_professions(groq_api_key):
         ]
     )
 
-    with st.spinner("Generating profession matches..."):
-        response = client.chat.completions.create(
-            model=st.session_state.model,
-            response_model=ProfessionResponse,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are a career advisor assistant. Generate detailed profession matches 
-                    based on the user's AIKS profile. For each profession, include a day-in-the-life 
-                    example that would appeal to teenagers.""",
-                },
-                {
-                    "role": "user",
-                    "content": f"""Based on the following assessment data, suggest the top 5-10 professions 
-                    that would be most fulfilling for this person. For each profession, provide:
-                    1. A realistic day-in-the-life example
-                    2. A brief explanation of the career
-                    3. Required skills and education
-                    4. How it aligns with their AIKS profile
-
-                    Assessment Data:
-                    {aiks_summary}""",
-                },
-            ],
-            temperature=0.7,
+    return [
+        {
+            "role": "system",
+            "content": """You are a career advisor assistant. Generate detailed profession matches 
+            based on the user's AIKS profile. For each profession, include a day-in-the-life 
+            example that would appeal to teenagers.""",
+        },
+        {
+            "role": "user",
+            "content": f"""Based on the following assessment data, {ask}. 
+            For each profession, provide:
+            1. A realistic day-in-the-life example
+            2. A brief explanation of the career
+            3. Required skills and education
+            4. How it aligns with their AIKS profile
+
+            Assessment Data:
+            {aiks_summary}{excluded_titles_note(exclude_titles)}""",
+        },
+    ]
+
+
+def excluded_titles_note(exclude_titles) -> str:
+    if not exclude_titles:
+        return ""
+    return """
+
+            Don't suggest any of these professions, the person has already seen them:
+            """ + ", ".join(sorted(exclude_titles))
+
+
+def build_details_messages(candidates, aiks_data: dict) -> list[dict]:
+    """Build the prompt messages to personalize catalog professions"""
+    aiks_summary = "\n".join(
+        [
+            f"{category.title()}: " + ", ".join(items)
+            for category, items in aiks_data.items()
+        ]
+    )
+    candidate_titles = "\n".join(f"- {occupation.title}" for occupation in candidates)
+
+    return [
+        {
+            "role": "system",
+            "content": """You are a career advisor assistant. You personalize descriptions 
+            of given professions for a teenager based on their AIKS profile.""",
+        },
+        {
+            "role": "user",
+            "content": f"""For each of the professions below, in the same order and with 
+            exactly the same title, provide:
+            1. A realistic day-in-the-life example that would appeal to this person
+            2. How it aligns with their AIKS profile, as lists of their items per category
+
+            Professions:
+            {candidate_titles}
+
+            Assessment Data:
+            {aiks_summary}""",
+        },
+    ]
+
+
+def build_titles_messages(
+    aiks_data: dict, count: int = None, exclude_titles=()
+) -> list[dict]:
+    """Build the prompt messages for a quick list of profession titles"""
+    messages = build_profession_messages(
+        aiks_data, profession_ask(count), exclude_titles
+    )
+    messages[1]["content"] += """
+
+            Only list the profession titles, details will be asked separately."""
+    return messages
+
+
+def build_single_profession_messages(title: str, aiks_data: dict) -> list[dict]:
+    """Build the prompt messages to describe one profession in detail"""
+    return build_profession_messages(
+        aiks_data, ask=f'describe the profession "{title}" for this person'
+    )
+
+
+def profession_cache_key() -> str:
+    """Cache key for the current AIKS profile, model and matching mode"""
+    return make_cache_key(
+        canonical_profile(st.session_state.aiks_data),
+        st.session_state.model,
+        st.session_state.matching_mode,
+    )
+
+
+def load_cached_professions():
+    """Get professions for the current profile from the cross-session cache"""
+    # Instant matches are computed locally faster than a cache lookup
+    if st.session_state.matching_mode == "instant":
+        return None
+
+    cached = get_disk_cache("professions").get(profession_cache_key())
+    if cached is None:
+        return None
+    return ProfessionResponse.model_validate_json(cached).professions
+
+
+def save_cached_professions(professions):
+    if st.session_state.matching_mode == "instant":
+        return
+
+    get_disk_cache("professions").set(
+        profession_cache_key(),
+        ProfessionResponse(professions=professions).model_dump_json(),
+    )
+
+
+def catalog_candidates(aiks_data, exclude=frozenset(), count: int = None) -> list:
+    """Get the catalog occupations closest to the AIKS profile, except excluded"""
+    count = count or get_settings("matching").get("top_k", 8)
+    results = get_occupation_index().search(aiks_data, count + len(exclude))
+    return [
+        occupation
+        for occupation, _ in results
+        if canonicalize(occupation.title) not in exclude
+    ][:count]
+
+
+def catalog_professions(groq_api_key, stream: bool, exclude, count: int = None):
+    """Yield professions retrieved from the bundled occupation catalog.
+
+    The LLM only personalizes the retrieved candidates, and isn't called at all
+    in the "instant" matching mode.
+    """
+    index = get_occupation_index()
+    aiks_data = st.session_state.aiks_data
+    candidates = catalog_candidates(aiks_data, exclude, count)
+
+    if st.session_state.matching_mode == "instant":
+        for occupation in candidates:
+            yield index.to_profession(occupation, aiks_data)
+        return
+
+    if not candidates:
+        return
+
+    client = get_llm_client(groq_api_key)
+    gateway = get_llm_gateway()
+    messages = build_details_messages(candidates, aiks_data)
+    if stream:
+        all_details = gateway.stream(
+            "professions",
+            lambda model: client.chat.completions.create_iterable(
+                model=model,
+                response_model=ProfessionDetails,
+                messages=messages,
+                temperature=0.7,
+            ),
+            st.session_state.model,
+            messages,
         )
+    else:
+        all_details = gateway.call(
+            "professions",
+            lambda model: client.chat.completions.create(
+                model=model,
+                response_model=ProfessionDetailsResponse,
+                messages=messages,
+                temperature=0.7,
+            ),
+            st.session_state.model,
+            messages,
+            ProfessionDetailsResponse,
+        ).professions
+
+    for details in all_details:
+        occupation = index.get(details.title)
+        # Skip titles the model made up
+        if occupation is not None:
+            yield index.to_profession(occupation, aiks_data, details)
+
+
+def parallel_professions(groq_api_key, exclude, count: int = None):
+    """Yield professions generated concurrently, one request per profession.
+
+    In "llm" mode a quick request gets the titles first, in "catalog" mode
+    the titles come from the catalog. Total time is roughly the time of the
+    slowest single profession instead of the sum of all of them.
+    """
+    aiks_data = st.session_state.aiks_data
+    model = st.session_state.model
+    gateway = get_llm_gateway()
+    client = get_async_llm_client(groq_api_key)
+    index = get_occupation_index()
+
+    if st.session_state.matching_mode == "catalog":
+        requests = [
+            (
+                occupation,
+                ProfessionDetails,
+                build_details_messages([occupation], aiks_data),
+            )
+            for occupation in catalog_candidates(aiks_data, exclude, count)
+        ]
+    else:
+        sync_client = get_llm_client(groq_api_key)
+        messages = build_titles_messages(
+            aiks_data, count, excluded_display_titles(exclude)
+        )
+        titles = gateway.call(
+            "titles",
+            lambda routed_model: sync_client.chat.completions.create(
+                model=routed_model,
+                response_model=ProfessionTitles,
+                messages=messages,
+                temperature=0.7,
+            ),
+            model,
+            messages,
+            ProfessionTitles,
+        ).titles
+        unique_titles = {}
+        for title in titles:
+            if canonicalize(title) not in exclude:
+                unique_titles.setdefault(canonicalize(title), title)
+        requests = [
+            (None, Profession, build_single_profession_messages(title, aiks_data))
+            for title in unique_titles.values()
+        ]
+
+    async def generate(occupation, response_model, messages):
+        result = await gateway.acall(
+            "professions",
+            lambda routed_model: client.chat.completions.create(
+                model=routed_model,
+                response_model=response_model,
+                messages=messages,
+                temperature=0.7,
+            ),
+            model,
+            messages,
+            response_model,
+        )
+        if occupation is not None:
+            return index.to_profession(occupation, aiks_data, result)
+        return result
+
+    yield from iterate_as_completed([generate(*request) for request in requests])
+
+
+def use_parallel_generation() -> bool:
+    return (
+        st.session_state.parallel_professions
+        and st.session_state.matching_mode != "instant"
+    )
+
+
+def excluded_display_titles(exclude) -> list[str]:
+    """Display titles of excluded professions, for the prompt"""
+    feedback = st.session_state.get("profession_feedback", {})
+    shown = st.session_state.get("generated_professions", [])
+    titles = {canonicalize(title): title for title in feedback}
+    titles.update({canonicalize(prof.title): prof.title for prof in shown})
+    return [titles.get(key, key) for key in exclude]
 
-        # Store in session state to avoid regenerating
-        st.session_state.generated_professions = response.professions
-        return response.professions
+
+def new_professions(groq_api_key, exclude=frozenset(), count: int = None):
+    """Yield professions in the current matching mode, none of the excluded ones.
+
+    exclude holds canonical titles, count=None asks for a full first set.
+    """
+    stream = st.session_state.stream_professions
+    if use_parallel_generation():
+        yield from parallel_professions(groq_api_key, exclude, count)
+        return
+
+    if st.session_state.matching_mode != "llm":
+        yield from catalog_professions(groq_api_key, stream, exclude, count)
+        return
+
+    client = get_llm_client(groq_api_key)
+    gateway = get_llm_gateway()
+    messages = build_profession_messages(
+        st.session_state.aiks_data,
+        profession_ask(count),
+        excluded_display_titles(exclude),
+    )
+
+    if stream:
+        yield from gateway.stream(
+            "professions",
+            lambda model: client.chat.completions.create_iterable(
+                model=model,
+                response_model=Profession,
+                messages=messages,
+                temperature=0.7,
+            ),
+            st.session_state.model,
+            messages,
+        )
+    else:
+        yield from gateway.call(
+            "professions",
+            lambda model: client.chat.completions.create(
+                model=model,
+                response_model=ProfessionResponse,
+                messages=messages,
+                temperature=0.7,
+            ),
+            st.session_state.model,
+            messages,
+            ProfessionResponse,
+        ).professions
+
+
+def render_new_professions(groq_api_key, count: int = None, resume: bool = False):
+    """Generate professions not shown yet and render them below the existing cards.
+
+    Shown and disliked professions are excluded from the request, and new ones
+    are de-duplicated against them, so nothing is requested or drawn twice.
+    A set cut short by a rerun (e.g. a thumbs up while streaming) is left in
+    _missing_professions, and resume=True asks for the rest of it.
+    """
+    is_first_set = "generated_professions" not in st.session_state
+    if resume:
+        missing = st.session_state._missing_professions
+        count, is_first_set = missing["count"], missing["first_set"]
+    else:
+        missing = st.session_state._missing_professions = {
+            "count": count or get_settings("matching").get("top_k", 8),
+            "first_set": is_first_set,
+        }
+
+    # Filled in place, so a rerun in the middle of the stream (e.g. a thumbs up
+    # on an early card) keeps the cards that were already shown
+    professions = st.session_state.setdefault("generated_professions", [])
+
+    feedback = st.session_state.get("profession_feedback", {})
+    exclude = {canonicalize(prof.title) for prof in professions}
+    exclude |= {canonicalize(title) for title, liked in feedback.items() if not liked}
+
+    mark_dirty("generated_professions")
+    try:
+        with st.spinner("Generating profession matches..."):
+            for prof in new_professions(groq_api_key, frozenset(exclude), count):
+                if canonicalize(prof.title) in exclude:
+                    continue
+                exclude.add(canonicalize(prof.title))
+                professions.append(prof)
+                missing["count"] -= 1
+                profession_card(prof)
+                st.divider()
+    except Exception:
+        # Failed rather than cut short, not worth repeating on every rerun
+        del st.session_state._missing_professions
+        raise
+    finally:
+        if is_first_set and not professions:
+            del st.session_state.generated_professions
+    del st.session_state._missing_professions
+
+    # Only a complete first set is shared with other sessions
+    if is_first_set and professions:
+        save_cached_professions(professions)
+
+    return professions
 
 
 def handle_feedback(profession_title: str, feedback_value: bool, profession_data: dict):
@@ -60,23 +412,29 @@ def handle_feedback(profession_title: str, feedback_value: bool, profession_data
         st.session_state.profession_feedback = {}
 
     st.session_state.profession_feedback[profession_title] = feedback_value
+    mark_dirty("liked_professions")
 
     # Update liked professions based on feedback
     if feedback_value:  # True means thumbs up
         if "liked_professions" not in st.session_state:
             st.session_state.liked_professions = {}
         st.session_state.liked_professions[profession_title] = profession_data
+        # Answer the standard questions before the user gets to ask them
+        start_dossier(profession_data, st.secrets["groq"]["api_key"])
     else:
         # Remove from liked professions if feedback is negative
         st.session_state.liked_professions.pop(profession_title, None)
+        discard_dossier(profession_title)
 
 
-def profession_card(prof, idx):
+def profession_card(prof, score: float = None):
     """Render a single profession card"""
     col1, col2 = st.columns([5, 1])
 
     with col1:
         st.subheader(prof.title)
+        if score is not None:
+            st.caption(f"🎯 {score:.0%} match with your profile")
 
     with col2:
         # Get current feedback value from session state
@@ -86,7 +444,8 @@ def profession_card(prof, idx):
 
         feedback = st.feedback(
             "thumbs",
-            key=f"feedback_{idx}_{prof.title}",
+            # Keyed by title only, so the feedback survives reordering
+            key=f"feedback_{prof.title}",
         )
 
         # Handle feedback changes
@@ -126,13 +485,17 @@ def main():
 
     col1, col2 = st.columns(2)
 
-    # Initialize or get professions
-    if "generated_professions" not in st.session_state or col1.button(
+    # Initialize or get professions, from the shared cache if possible
+    if "generated_professions" not in st.session_state:
+        cached = load_cached_professions()
+        if cached is not None:
+            st.session_state.generated_professions = cached
+            mark_dirty("generated_professions")
+
+    # Adds new professions below the shown ones, always bypassing the caches
+    find_more = "generated_professions" in st.session_state and col1.button(
         "Find New Matches"
-    ):
-        professions = generate_professions(st.secrets["groq"]["api_key"])
-    else:
-        professions = st.session_state.generated_professions
+    )
 
     if len(st.session_state.get("liked_professions", {})) > 0:
         if col2.button("View Liked Professions"):
@@ -140,37 +503,66 @@ def main():
 
     st.divider()
 
+    if "generated_professions" not in st.session_state:
+        # Cards are rendered as they arrive, nothing left to draw
+        with section("generation"):
+            render_new_professions(st.secrets["groq"]["api_key"])
+        return
+
+    professions = st.session_state.generated_professions
+
     # Display professions
     if professions:
-        # Filters
-        # st.subheader("Filter Professions")
-        # col1, col2 = st.columns(2)
-        # with col1:
-        #     show_liked_only = st.checkbox("Show liked careers only", value=False)
-        # with col2:
-        #     sort_by = st.selectbox("Sort by:", ["Relevance", "Title A-Z", "Liked First"], index=0)
-
-        # # Apply filters
-        # filtered_professions = professions
-        # if show_liked_only:
-        #     liked_titles = set(st.session_state.get("liked_professions", {}).keys())
-        #     filtered_professions = [p for p in professions if p.title in liked_titles]
-        #
-        # if sort_by == "Title A-Z":
-        #     filtered_professions = sorted(filtered_professions, key=lambda x: x.title)
-        # elif sort_by == "Liked First":
-        #     filtered_professions = sorted(
-        #         filtered_professions,
-        #         key=lambda x: st.session_state.get("profession_feedback", {}).get(x.title, False),
-        #         reverse=True,
-        #     )
+        # Filters, sorting and scores are local, so they never call the LLM
+        st.subheader("Filter Professions")
+        col1, col2 = st.columns(2)
+        with col1:
+            show_liked_only = st.checkbox("Show liked careers only", value=False)
+        with col2:
+            sort_by = st.selectbox(
+                "Sort by:", ["Relevance", "Liked First", "Title A-Z"], index=0
+            )
+
+        with section("scores"):
+            scores = get_profession_scores(professions)
+        feedback = st.session_state.get("profession_feedback", {})
+
+        # Apply filters
         filtered_professions = professions
+        if show_liked_only:
+            liked_titles = set(st.session_state.get("liked_professions", {}).keys())
+            filtered_professions = [p for p in professions if p.title in liked_titles]
+
+        if sort_by == "Title A-Z":
+            filtered_professions = sorted(filtered_professions, key=lambda x: x.title)
+        elif sort_by == "Liked First":
+            filtered_professions = sorted(
+                filtered_professions,
+                key=lambda x: (bool(feedback.get(x.title)), scores[x.title]),
+                reverse=True,
+            )
+        else:
+            filtered_professions = sorted(
+                filtered_professions, key=lambda x: scores[x.title], reverse=True
+            )
 
         # Display professions
-        for idx, prof in enumerate(filtered_professions):
-            profession_card(prof, idx)
-            st.divider()
+        with section("cards"):
+            for prof in filtered_professions:
+                profession_card(prof, scores[prof.title])
+                st.divider()
+
+    if find_more:
+        with section("generation"):
+            render_new_professions(
+                st.secrets["groq"]["api_key"],
+                count=get_settings("matching").get("more_count", 5),
+            )
+    elif st.session_state.get("_missing_professions", {}).get("count", 0) > 0:
+        with section("generation"):
+            render_new_professions(st.secrets["groq"]["api_key"], resume=True)
 
 
 if __name__ == "__main__":
-    main()
+    with timed_rerun("Matching Professions"), persisted_session():
+        main()
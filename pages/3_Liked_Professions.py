@@ -1,34 +1,26 @@
 # pages/3_Liked_Professions.py
-from openai import OpenAI
 import streamlit as st
-import instructor
-from groq import Groq
-from pydantic import BaseModel
-from shared_utils import init_session_state, render_sidebar
+from chat_memory import ChatMessage
+from disk_cache import get_disk_cache
+from llm_client import get_llm_client
+from llm_gateway import get_llm_gateway
+from models import ChatResponse
+from perf import section, timed_rerun
+from profession_chat import (
+    answer_cache_key,
+    build_chat_messages,
+    chat_key,
+    get_dossier_answer,
+    get_suggested_questions,
+    open_chat,
+    start_dossier,
+)
+from session_store import mark_dirty, persisted_session
+from shared_utils import init_session_state, render_sidebar, visible_messages
 
 st.set_page_config(page_icon="💼", page_title="Liked Professions", layout="centered")
 
 
-class ChatResponse(BaseModel):
-    """Model for career advice chat responses"""
-
-    content: str
-    tone: str = "friendly"
-    focus_areas: list[str] = []
-
-
-def get_suggested_questions(title: str) -> list[str]:
-    """Get list of suggested questions for a profession"""
-    return [
-        "What education or training do I need?",
-        "What's a typical work day like?",
-        "What skills are most important?",
-        "What companies are hiring?",
-        "What's the salary range?",
-        "What are the challenges?",
-    ]
-
-
 def render_question_buttons(title: str, container):
     """Render suggested questions as buttons in a grid"""
     questions = get_suggested_questions(title)
@@ -56,30 +48,106 @@ def render_question_buttons(title: str, container):
 def get_profession_chat_response(
     profession_title: str, question: str, groq_api_key: str
 ) -> str:
-    client = instructor.from_groq(Groq(api_key=groq_api_key), mode=instructor.Mode.JSON)
+    client = get_llm_client(groq_api_key)
+    messages = build_chat_messages(profession_title, question)
 
-    prompt = f"""As a career counselor specialized in {profession_title}, provide detailed, 
-    practical answers to questions about this career. Base your responses on real-world experience 
-    and current industry knowledge. Keep answers relevant and engaging for teenagers. 
-    Respond in markdown format, make text readable by formatting. Make UK specific answers.
+    with st.status("Getting answer...", expanded=True):
+        response = get_llm_gateway().call(
+            "chat",
+            lambda model: client.chat.completions.create(
+                model=model,
+                response_model=ChatResponse,
+                messages=messages,
+                temperature=0.7,
+            ),
+            st.session_state.model,
+            messages,
+            ChatResponse,
+        )
 
-    Previous context:
-    {st.session_state.liked_professions[profession_title].daily_life_example}
+    return response.content
 
-    Question: {question}"""
 
-    with st.status("Getting answer...", expanded=True):
-        response = client.chat.completions.create(
-            model=st.session_state.model,
+def stream_profession_chat_response(
+    profession_title: str, question: str, groq_api_key: str
+):
+    """Yield the answer text in chunks as the model generates it"""
+    client = get_llm_client(groq_api_key)
+    messages = build_chat_messages(profession_title, question)
+
+    partial_responses = get_llm_gateway().stream(
+        "chat",
+        lambda model: client.chat.completions.create_partial(
+            model=model,
             response_model=ChatResponse,
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": question},
-            ],
+            messages=messages,
             temperature=0.7,
-        )
+        ),
+        st.session_state.model,
+        messages,
+    )
+
+    streamed = ""
+    for partial in partial_responses:
+        content = partial.content or ""
+        if len(content) > len(streamed):
+            yield content[len(streamed) :]
+            streamed = content
+
+
+def answer_question(title: str, question: str, container):
+    """Add a question to the profession chat, render and store the answer"""
+    mark_dirty(chat_key(title))
+    st.session_state[chat_key(title)].append(ChatMessage("user", question))
+
+    # Answers to the standard questions don't depend on the user, so they are
+    # shared between all sessions
+    answer_cache = get_disk_cache("answers")
+    is_standard_question = question in get_suggested_questions(title)
+    cached_response = (
+        answer_cache.get(answer_cache_key(title, question))
+        if is_standard_question
+        else None
+    )
+
+    with container:
+        with st.chat_message("user", avatar="👤"):
+            st.markdown(question)
 
-    return response.content
+        with st.chat_message("assistant", avatar="🧑‍💼"):
+            if cached_response is None and is_standard_question:
+                # The dossier stores its answers in the cache itself
+                cached_response = get_dossier_answer(title, question)
+            if cached_response is not None:
+                response = cached_response
+                st.markdown(response)
+            elif st.session_state.stream_chat:
+                # Render tokens as they arrive, st.write_stream returns the full text
+                response = st.write_stream(
+                    stream_profession_chat_response(
+                        title, question, st.secrets["groq"]["api_key"]
+                    )
+                )
+            else:
+                response = get_profession_chat_response(
+                    title, question, st.secrets["groq"]["api_key"]
+                )
+                st.markdown(response)
+
+            if is_standard_question and cached_response is None:
+                answer_cache.set(answer_cache_key(title, question), response)
+
+    st.session_state[chat_key(title)].append(ChatMessage("assistant", response))
+    st.rerun()
+
+
+@st.fragment
+def render_chat_messages(title):
+    """Render the chat window, a fragment so paging back reruns only the chat"""
+    messages = st.session_state[chat_key(title)]
+    for msg in visible_messages(messages, chat_key(title)):
+        with st.chat_message(msg.role, avatar="👤" if msg.role == "user" else "🧑‍💼"):
+            st.markdown(msg.content)
 
 
 def render_chat_interface(title, prof):
@@ -105,68 +173,26 @@ def render_chat_interface(title, prof):
     #         )
     #         st.session_state.profession_image[title] = response.data[0].url
 
-    # Initialize chat history for this profession if not exists
-    if f"chat_history_{title}" not in st.session_state:
-        st.session_state[f"chat_history_{title}"] = []
-        # Add initial welcome message
-        st.session_state[f"chat_history_{title}"].append(
-            {
-                "role": "assistant",
-                "content": f"""Hi! 👋 I'm your advisor for {title} career. 
-            Feel free to ask me anything about this path! 
-            Choose a question below or type your own:""",
-            }
-        )
-
-    # Display chat messages
-    messages = st.session_state[f"chat_history_{title}"]
+    # Load the chat for this profession back if it was spilled, or start it.
+    # Other chats over the memory budget are spilled
+    open_chat(title)
 
     # Chat container
     chat_container = st.container()
     with chat_container:
-        for msg in messages:
-            with st.chat_message(
-                msg["role"], avatar="👤" if msg["role"] == "user" else "🧑‍💼"
-            ):
-                st.markdown(msg["content"])
+        render_chat_messages(title)
 
     # Show question buttons
     with st.container():
         selected_question = render_question_buttons(title, st.container())
         if selected_question:
-            # Add user message
-            st.session_state[f"chat_history_{title}"].append(
-                {"role": "user", "content": selected_question}
-            )
-
-            # Get and add assistant response
-            response = get_profession_chat_response(
-                title, selected_question, st.secrets["groq"]["api_key"]
-            )
-            st.session_state[f"chat_history_{title}"].append(
-                {"role": "assistant", "content": response}
-            )
-            st.rerun()
+            answer_question(title, selected_question, chat_container)
 
     # Chat input
     if prompt := st.chat_input(
         f"Ask anything about {title} career...", key=f"chat_input_{title}"
     ):
-        # Add user message
-        st.session_state[f"chat_history_{title}"].append(
-            {"role": "user", "content": prompt}
-        )
-
-        # Get and add assistant response
-        with st.chat_message("assistant", avatar="🧑‍💼"):
-            response = get_profession_chat_response(
-                title, prompt, st.secrets["groq"]["api_key"]
-            )
-            st.markdown(response)
-            st.session_state[f"chat_history_{title}"].append(
-                {"role": "assistant", "content": response}
-            )
-        st.rerun()
+        answer_question(title, prompt, chat_container)
 
 
 def main():
@@ -197,8 +223,12 @@ def main():
 
     # Render chat interface for selected profession
     prof = st.session_state.liked_professions[selected_profession]
-    render_chat_interface(selected_profession, prof)
+    # Liked before dossiers existed, or the last dossier failed
+    start_dossier(prof, st.secrets["groq"]["api_key"])
+    with section("chat"):
+        render_chat_interface(selected_profession, prof)
 
 
 if __name__ == "__main__":
-    main()
+    with timed_rerun("Liked Professions"), persisted_session():
+        main()
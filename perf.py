@@ -0,0 +1,269 @@
+# perf.py
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Rolling history sizes, small enough to keep the panel cheap in production
+RERUN_HISTORY = 100
+LLM_CALL_HISTORY = 500
+
+
+# Session and page of background work, which has no script run context
+trace_attributes: ContextVar[dict] = ContextVar("trace_attributes", default=None)
+
+
+def current_trace_attributes() -> dict:
+    """Get the session id and page the current LLM call is made for"""
+    attributes = trace_attributes.get()
+    if attributes is not None:
+        return attributes
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return {"session_id": None, "page": None}
+    page = ctx.pages_manager.get_pages().get(
+        ctx.pages_manager.current_page_script_hash, {}
+    )
+    return {"session_id": ctx.session_id, "page": page.get("page_name")}
+
+
+def with_trace_attributes(fn):
+    """Wrap fn to keep the current session and page when run in another thread"""
+    attributes = current_trace_attributes()
+
+    def run(*args, **kwargs):
+        token = trace_attributes.set(attributes)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            trace_attributes.reset(token)
+
+    return run
+
+
+@dataclass(slots=True)
+class LLMCall:
+    task: str
+    model: str
+    started: float = field(default_factory=time.perf_counter)
+    timestamp: float = field(default_factory=time.time)
+    latency: float = None
+    ttft: float = None
+    queued: float = 0.0
+    prompt_tokens: int = None
+    completion_tokens: int = None
+    attempts: int = 0
+    validation_errors: int = 0
+    repairs: set = field(default_factory=set)
+    error: str = None
+    response_model: str = None
+    session_id: str = None
+    page: str = None
+
+    def __post_init__(self):
+        attributes = current_trace_attributes()
+        self.session_id = attributes["session_id"]
+        self.page = attributes["page"]
+
+    @property
+    def retries(self) -> int:
+        return max(self.attempts - 1, 0)
+
+    @contextmanager
+    def active(self):
+        """Attribute instructor hook events in this block to the call"""
+        token = current_call.set(self)
+        try:
+            yield self
+        finally:
+            current_call.reset(token)
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+
+    def finish(self, error: Exception = None):
+        self.latency = time.perf_counter() - self.started
+        self.first_token()
+        if error is not None:
+            self.error = type(error).__name__
+        get_llm_call_log().add(self)
+
+        from tracing import export_call  # imports shared_utils, which imports this
+
+        export_call(self)
+
+
+# The call being made in the current thread or asyncio task, for the hooks
+current_call: ContextVar[LLMCall] = ContextVar("current_call", default=None)
+
+
+def percentile(values, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class LLMCallLog:
+    """Process-wide rolling log of LLM calls from all sessions"""
+
+    def __init__(self, maxlen: int):
+        self.calls = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, call: LLMCall):
+        with self._lock:
+            self.calls.append(call)
+
+    def snapshot(self) -> list[LLMCall]:
+        with self._lock:
+            return list(self.calls)
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm_call_log() -> LLMCallLog:
+    return LLMCallLog(LLM_CALL_HISTORY)
+
+
+def install_hooks(client):
+    """Count attempts, validation errors and tokens of an instructor client"""
+
+    def on_kwargs(*args, **kwargs):
+        if (call := current_call.get()) is not None:
+            call.attempts += 1
+
+    def on_response(response):
+        call = current_call.get()
+        usage = getattr(response, "usage", None)
+        if call is not None and usage is not None:
+            call.prompt_tokens = (call.prompt_tokens or 0) + usage.prompt_tokens
+            call.completion_tokens = (
+                call.completion_tokens or 0
+            ) + usage.completion_tokens
+
+    def on_parse_error(error):
+        if (call := current_call.get()) is not None:
+            call.validation_errors += 1
+
+    client.on("completion:kwargs", on_kwargs)
+    client.on("completion:response", on_response)
+    client.on("parse:error", on_parse_error)
+    return client
+
+
+def record_repair(defect: str):
+    """Note a defect in the output of the current call that was fixed locally"""
+    if (call := current_call.get()) is not None:
+        # A set, streamed partial responses are validated over and over
+        call.repairs.add(defect)
+
+
+@contextmanager
+def track_llm_call(task: str, model: str):
+    """Measure one LLM call, the instructor hooks fill in tokens and retries"""
+    call = LLMCall(task=task, model=model)
+    try:
+        with call.active():
+            yield call
+    except BaseException as e:
+        call.finish(e)
+        raise
+    call.finish()
+
+
+@contextmanager
+def timed_rerun(page: str):
+    """Measure a whole script run of a page, with its sections"""
+    run = {"page": page, "sections": {}}
+    st.session_state["_perf_current_run"] = run
+    start = time.perf_counter()
+    try:
+        yield run
+    finally:
+        run["total"] = time.perf_counter() - start
+        st.session_state["_perf_current_run"] = None
+        st.session_state.setdefault("_perf_reruns", deque(maxlen=RERUN_HISTORY))
+        st.session_state["_perf_reruns"].append(run)
+
+
+@contextmanager
+def section(name: str):
+    """Measure a section of the current script run, no-op outside timed_rerun"""
+    run = st.session_state.get("_perf_current_run")
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if run is not None:
+            run["sections"][name] = (
+                run["sections"].get(name, 0.0) + time.perf_counter() - start
+            )
+
+
+def format_ms(seconds) -> str:
+    return "–" if seconds is None else f"{seconds * 1000:.0f} ms"
+
+
+def render_perf_panel():
+    """Render rerun and LLM call timings collected so far"""
+    reruns = list(st.session_state.get("_perf_reruns", []))
+    st.subheader("Reruns")
+    if reruns:
+        last = reruns[-1]
+        totals = [run["total"] for run in reruns]
+        st.caption(
+            f"Last ({last['page']}): {format_ms(last['total'])} — "
+            + ", ".join(
+                f"{name} {format_ms(elapsed)}"
+                for name, elapsed in last["sections"].items()
+            )
+        )
+        st.caption(
+            f"{len(reruns)} reruns: p50 {format_ms(percentile(totals, 0.5))}, "
+            f"p95 {format_ms(percentile(totals, 0.95))}"
+        )
+    else:
+        st.caption("No reruns measured yet")
+
+    calls = get_llm_call_log().snapshot()
+    st.subheader("LLM Calls")
+    if not calls:
+        st.caption("No LLM calls yet")
+        return
+
+    latencies = [call.latency for call in calls]
+    ttfts = [call.ttft for call in calls]
+    st.caption(
+        f"{len(calls)} calls: latency p50 {format_ms(percentile(latencies, 0.5))}, "
+        f"p95 {format_ms(percentile(latencies, 0.95))}; "
+        f"first token p50 {format_ms(percentile(ttfts, 0.5))}, "
+        f"p95 {format_ms(percentile(ttfts, 0.95))}; "
+        f"retries {sum(call.retries for call in calls)}, "
+        f"re-asks after validation errors {sum(c.validation_errors for c in calls)}, "
+        f"locally repaired {sum(bool(call.repairs) for call in calls)}"
+    )
+
+    from tracing import get_span_processor  # imports shared_utils, which imports this
+
+    processor = get_span_processor()
+    st.caption(f"Traces: {processor.exported} exported, {processor.dropped} dropped")
+    # A markdown table, so the panel doesn't need pyarrow on every rerun
+    rows = [
+        f"| {call.task} | {call.model} | {format_ms(call.latency)} "
+        f"| {format_ms(call.queued)} | {format_ms(call.ttft)} "
+        f"| {call.prompt_tokens or '–'} "
+        f"| {call.completion_tokens or '–'} | {call.retries} "
+        f"| {', '.join(sorted(call.repairs))} | {call.error or ''} |"
+        for call in reversed(calls[-20:])
+    ]
+    st.markdown(
+        "| task | model | latency | queued | first token | prompt | completion "
+        "| retries | repairs | error |\n"
+        "|---|---|---|---|---|---|---|---|---|---|\n" + "\n".join(rows)
+    )
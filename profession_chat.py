@@ -0,0 +1,262 @@
+# profession_chat.py
+import functools
+from concurrent.futures import Future
+
+import streamlit as st
+
+from chat_memory import ChatMessage, chat_size
+from disk_cache import get_disk_cache, make_cache_key
+from llm_client import get_llm_client
+from llm_gateway import background, get_llm_gateway
+from models import ProfessionDossier
+from perf import with_trace_attributes
+from session_store import PERSISTED_PREFIXES, load_spilled, mark_dirty, spill
+from shared_utils import get_settings
+from speculation import get_prefetch_executor
+
+COUNSELOR_PROMPT = """As a career counselor specialized in {title}, provide detailed,
+    practical answers to questions about this career. Base your responses on real-world experience
+    and current industry knowledge. Keep answers relevant and engaging for teenagers.
+    Respond in markdown format, make text readable by formatting. Make UK specific answers.
+
+    Previous context:
+    {daily_life_example}
+"""
+
+# Profession chats kept in memory per session, in KiB of messages. Override it
+# in the [chat] section of .streamlit/secrets.toml. The least recently opened
+# ones over it go to the session store until opened again. The assessment chat
+# is always in memory, so it doesn't count
+DEFAULT_MEMORY_BUDGET_KB = 256
+
+
+def get_suggested_questions(title: str) -> list[str]:
+    """Get list of suggested questions for a profession"""
+    return [
+        "What education or training do I need?",
+        "What's a typical work day like?",
+        "What skills are most important?",
+        "What companies are hiring?",
+        "What's the salary range?",
+        "What are the challenges?",
+    ]
+
+
+def chat_key(title: str) -> str:
+    return f"chat_history_{title}"
+
+
+def welcome_message(title: str) -> ChatMessage:
+    return ChatMessage(
+        "assistant",
+        f"""Hi! 👋 I'm your advisor for {title} career. 
+            Feel free to ask me anything about this path! 
+            Choose a question below or type your own:""",
+    )
+
+
+def profession_chats() -> dict[str, int]:
+    """Sizes in bytes of the profession chats in memory, by state key"""
+    return {
+        key: chat_size(st.session_state[key])
+        for key in list(st.session_state.keys())
+        if key.startswith(tuple(PERSISTED_PREFIXES))
+    }
+
+
+def chat_memory_usage() -> tuple[int, int]:
+    """Bytes of profession chat messages in memory and the session's budget"""
+    budget = get_settings("chat").get("memory_budget_kb", DEFAULT_MEMORY_BUDGET_KB)
+    return sum(profession_chats().values()), budget * 1024
+
+
+def enforce_memory_budget(keep: str):
+    """Spill the least recently opened profession chats until under budget"""
+    used, budget = chat_memory_usage()
+    if used <= budget:
+        return
+    sizes = profession_chats()
+    order = st.session_state.get("_chat_order", [])
+    # Chats not opened in this browser session yet go first
+    candidates = [key for key in sizes if key not in order]
+    candidates += [key for key in order if key in sizes]
+    for key in candidates:
+        if used <= budget:
+            break
+        if key != keep and spill(key):
+            used -= sizes[key]
+
+
+def open_chat(title: str) -> list[ChatMessage]:
+    """Get the chat about a profession, loaded back from the store or new"""
+    key = chat_key(title)
+    if key not in st.session_state and not load_spilled(key):
+        st.session_state[key] = [welcome_message(title)]
+        mark_dirty(key)
+
+    if "_chat_order" not in st.session_state:
+        st.session_state._chat_order = []
+    order = st.session_state._chat_order
+    if key in order:
+        order.remove(key)
+    order.append(key)
+
+    enforce_memory_budget(keep=key)
+    return st.session_state[key]
+
+
+def build_chat_messages(profession_title: str, question: str) -> list[dict]:
+    """Build the prompt messages for a profession chat question"""
+    prompt = COUNSELOR_PROMPT.format(
+        title=profession_title,
+        daily_life_example=st.session_state.liked_professions[
+            profession_title
+        ].daily_life_example,
+    )
+    return [
+        {"role": "system", "content": f"{prompt}\n    Question: {question}"},
+        {"role": "user", "content": question},
+    ]
+
+
+def build_dossier_messages(prof, questions: list[str]) -> list[dict]:
+    """Build the prompt messages asking all questions about a profession at once"""
+    prompt = COUNSELOR_PROMPT.format(
+        title=prof.title, daily_life_example=prof.daily_life_example
+    )
+    listed = "\n".join(f"    - {question}" for question in questions)
+    return [
+        {
+            "role": "system",
+            "content": f"{prompt}\n    Questions:\n{listed}\n\n"
+            "    Answer every question on its own, in the same order, "
+            "and repeat each question exactly as written.",
+        },
+        {"role": "user", "content": "Please answer all of these questions."},
+    ]
+
+
+def answer_cache_key(title: str, question: str) -> str:
+    """Cache key for a standard question about a profession"""
+    return make_cache_key(
+        " ".join(title.lower().split()), question, st.session_state.model
+    )
+
+
+def match_answers(questions: list[str], dossier: ProfessionDossier) -> dict:
+    """Map the asked questions to answers, by text or else by position"""
+    by_question = {
+        " ".join(item.question.lower().split()): item.answer for item in dossier.answers
+    }
+    answers = {}
+    for idx, question in enumerate(questions):
+        answer = by_question.get(" ".join(question.lower().split()))
+        if answer is None and len(dossier.answers) == len(questions):
+            answer = dossier.answers[idx].answer
+        if answer:
+            answers[question] = answer
+    return answers
+
+
+def fetch_dossier(client, model, messages, questions, answer_cache, cache_keys) -> dict:
+    """Answer all questions in one request and store them in the answers cache.
+
+    Safe to call outside the script thread.
+    """
+    dossier = get_llm_gateway().call(
+        "chat",
+        lambda routed_model: client.chat.completions.create(
+            model=routed_model,
+            response_model=ProfessionDossier,
+            messages=messages,
+            temperature=0.7,
+        ),
+        model,
+        messages,
+        ProfessionDossier,
+    )
+    answers = match_answers(questions, dossier)
+    for question, answer in answers.items():
+        answer_cache.set(cache_keys[question], answer)
+    return answers
+
+
+def start_dossier(prof, groq_api_key: str):
+    """Answer the suggested questions about a liked profession in the background.
+
+    Questions already in the answers cache are left out, no request is made
+    if all of them are.
+    """
+    dossiers = st.session_state.profession_dossiers
+    if dossier_failed(dossiers.get(prof.title)):
+        del dossiers[prof.title]  # Try again
+    if prof.title in dossiers:
+        return
+
+    answer_cache = get_disk_cache("answers")
+    cache_keys = {
+        question: answer_cache_key(prof.title, question)
+        for question in get_suggested_questions(prof.title)
+    }
+    # Not counted as cache hits or misses, answer_question() counts them when
+    # the question is actually asked
+    questions = [
+        question for question, key in cache_keys.items() if key not in answer_cache
+    ]
+    if not questions:
+        dossiers[prof.title] = None  # Don't look them up on every rerun
+        return
+
+    job = functools.partial(
+        fetch_dossier,
+        get_llm_client(groq_api_key),
+        st.session_state.model,
+        build_dossier_messages(prof, questions),
+        questions,
+        answer_cache,
+        cache_keys,
+    )
+    future = get_prefetch_executor().submit(background(with_trace_attributes(job)))
+    dossiers[prof.title] = (future, job)
+
+
+def dossier_failed(dossier) -> bool:
+    if dossier is None:
+        return False
+    future = dossier[0]
+    return future.done() and not future.cancelled() and future.exception() is not None
+
+
+def discard_dossier(title: str):
+    """Forget the dossier of a profession that is no longer liked"""
+    dossier = st.session_state.profession_dossiers.pop(title, None)
+    if dossier is not None:
+        dossier[0].cancel()
+
+
+def get_dossier_answer(title: str, question: str):
+    """Get the answer from the profession's dossier, or None if there is none.
+
+    A dossier that isn't written yet is asked for at the user's priority,
+    that is quicker than asking the question on its own. Through the gateway
+    this joins the background request if it is already in flight, and moves
+    it ahead of other background work.
+    """
+    dossiers = st.session_state.profession_dossiers
+    dossier = dossiers.get(title)
+    if dossier is None:
+        return None
+    future, job = dossier
+    if not future.done() or future.cancelled():
+        future.cancel()  # Still queued in the prefetch pool
+        with st.status("Getting answer...", expanded=True):
+            future = Future()
+            try:
+                future.set_result(job())
+            except Exception as e:
+                future.set_exception(e)
+        dossiers[title] = (future, job)
+    if future.exception() is not None:
+        del dossiers[title]  # Started again when the profession is next shown
+        return None
+    return future.result().get(question)
@@ -0,0 +1,64 @@
+# profession_scoring.py
+import numpy as np
+import streamlit as st
+
+from aiks_profile import canonical_profile, canonicalize
+from disk_cache import make_cache_key
+from text_similarity import TfidfVectorizer
+
+# Share of the score that comes from the profile items the profession's
+# aiks_alignment mentions, the rest is text similarity
+ALIGNMENT_WEIGHT = 0.3
+
+
+def profession_text(prof) -> str:
+    alignments = [item for items in prof.aiks_alignment.values() for item in items]
+    return " ".join([prof.title, prof.explanation, *prof.required_skills, *alignments])
+
+
+def score_professions(professions: list, aiks_data) -> np.ndarray:
+    """Relevance of each profession to the AIKS profile, between 0 and 1"""
+    items = [item for category_items in aiks_data.values() for item in category_items]
+    if not professions or not items:
+        return np.zeros(len(professions), dtype=np.float32)
+
+    # Cosine similarity of the profile against every profession at once
+    vectorizer = TfidfVectorizer([profession_text(prof) for prof in professions])
+    similarity = vectorizer.matrix @ vectorizer.transform([" ".join(items)])[0]
+
+    # Share of the profile the model said the profession aligns with
+    profile_keys = {canonicalize(item) for item in items}
+    alignment = np.array(
+        [
+            len(
+                profile_keys
+                & {
+                    canonicalize(item)
+                    for aligned in prof.aiks_alignment.values()
+                    for item in aligned
+                }
+            )
+            / len(profile_keys)
+            for prof in professions
+        ],
+        dtype=np.float32,
+    )
+
+    return (1 - ALIGNMENT_WEIGHT) * similarity + ALIGNMENT_WEIGHT * alignment
+
+
+def get_profession_scores(professions: list) -> dict[str, float]:
+    """Relevance per profession title, recomputed only when the data changes"""
+    key = make_cache_key(
+        canonical_profile(st.session_state.aiks_data),
+        [prof.title for prof in professions],
+    )
+    cached = st.session_state.get("profession_scores")
+    if cached is None or cached[0] != key:
+        scores = score_professions(professions, st.session_state.aiks_data)
+        cached = (
+            key,
+            {prof.title: float(score) for prof, score in zip(professions, scores)},
+        )
+        st.session_state.profession_scores = cached
+    return cached[1]
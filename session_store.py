@@ -0,0 +1,321 @@
+# session_store.py
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+from aiks_profile import AIKSProfile
+from chat_memory import dump_chat, load_chat
+from disk_cache import REDIS_PREFIX, cache_setting, get_redis_client
+from models import Profession
+from shared_utils import get_settings
+
+# Session state that survives a restart or a move to another replica. The
+# rest (prefetches, dossiers, the conversation context) is rebuilt as needed
+PERSISTED_KEYS = [
+    "model",
+    "matching_mode",
+    "stream_chat",
+    "stream_professions",
+    "parallel_professions",
+    "speculative_prefetch",
+    "chat_history",
+    "aiks_data",
+    "assessment_complete",
+    "current_question",
+    "liked_professions",
+    "profession_feedback",
+    "generated_professions",
+]
+# Plus one chat per liked profession. These are restored lazily, see
+# load_spilled()
+PERSISTED_PREFIXES = ["chat_history_"]
+
+
+def is_persisted(key: str) -> bool:
+    return key in PERSISTED_KEYS or key.startswith(tuple(PERSISTED_PREFIXES))
+
+
+def dump_json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def dump_profession(prof: Profession) -> dict:
+    return prof.model_dump(exclude_defaults=True)
+
+
+def load_profile(data: dict) -> AIKSProfile:
+    return AIKSProfile(
+        max_items=get_settings("profile").get("max_items_per_category", 20),
+        data=data,
+    )
+
+
+# (dump, load) for values that aren't plain JSON, by key or key prefix
+CODECS = {
+    "chat_history": (dump_chat, load_chat),
+    "chat_history_": (dump_chat, load_chat),
+    "aiks_data": (lambda profile: profile.to_dict(), load_profile),
+    "liked_professions": (
+        lambda liked: {title: dump_profession(prof) for title, prof in liked.items()},
+        lambda data: {
+            title: Profession.model_validate(prof) for title, prof in data.items()
+        },
+    ),
+    "generated_professions": (
+        lambda professions: [dump_profession(prof) for prof in professions],
+        lambda data: [Profession.model_validate(prof) for prof in data],
+    ),
+}
+
+
+def digest(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def get_codec(key: str) -> tuple:
+    for prefix in PERSISTED_PREFIXES:
+        if key.startswith(prefix):
+            return CODECS.get(prefix, (None, None))
+    return CODECS.get(key, (None, None))
+
+
+def serialize(key: str, value) -> str:
+    dump, _ = get_codec(key)
+    return dump_json(dump(value) if dump else value)
+
+
+def deserialize(key: str, text: str):
+    _, load = get_codec(key)
+    value = json.loads(text)
+    return load(value) if load else value
+
+
+class SqliteSessionStore:
+    """Session state in a local SQLite table, one row per state key"""
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, key)
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_updated_at "
+                "ON sessions (updated_at)"
+            )
+
+    def load(self, session_id: str) -> dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM sessions "
+                "WHERE session_id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.ttl),
+            ).fetchall()
+        return dict(rows)
+
+    def load_key(self, session_id: str, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM sessions "
+                "WHERE session_id = ? AND key = ? AND updated_at >= ?",
+                (session_id, key, time.time() - self.ttl),
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, session_id: str, changed: dict[str, str], removed: list[str]):
+        """Write changed keys and touch the rest, so the session expires as one"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                [(session_id, key, value, now) for key, value in changed.items()],
+            )
+            self._conn.executemany(
+                "DELETE FROM sessions WHERE session_id = ? AND key = ?",
+                [(session_id, key) for key in removed],
+            )
+            self._conn.execute(
+                "UPDATE sessions SET updated_at = ? WHERE session_id = ?",
+                (now, session_id),
+            )
+            self._conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,)
+            )
+
+
+class RedisSessionStore:
+    """Session state in one hash per session on a Redis-protocol server"""
+
+    def __init__(self, client, ttl: float):
+        self.ttl = ttl
+        self._client = client
+
+    def _key(self, session_id: str) -> str:
+        return f"{REDIS_PREFIX}:session:{session_id}"
+
+    def load(self, session_id: str) -> dict[str, str]:
+        return self._client.hgetall(self._key(session_id))
+
+    def load_key(self, session_id: str, key: str) -> str | None:
+        return self._client.hget(self._key(session_id), key)
+
+    def save(self, session_id: str, changed: dict[str, str], removed: list[str]):
+        key = self._key(session_id)
+        pipe = self._client.pipeline()
+        if changed:
+            pipe.hset(key, mapping=changed)
+        if removed:
+            pipe.hdel(key, *removed)
+        pipe.expire(key, int(self.ttl))
+        pipe.execute()
+
+
+@st.cache_resource(show_spinner=False)
+def get_session_store():
+    """Get the process-wide session store, on the [cache] backend.
+
+    Settings can be overridden for it like for a cache named "sessions",
+    e.g. sessions_ttl.
+    """
+    ttl = cache_setting("sessions", "ttl")
+    if cache_setting("sessions", "backend") == "redis":
+        return RedisSessionStore(
+            get_redis_client(cache_setting("sessions", "redis_url")), ttl
+        )
+    return SqliteSessionStore(cache_setting("sessions", "path"), ttl)
+
+
+def mark_dirty(*keys: str):
+    """Have the next save write keys whose values were changed in place.
+
+    Values with a codec (chats, the profile, professions) grow with the
+    session, so save_session() serializes them again only when marked, or
+    when the key is new. Plain values are small and compared on every save.
+    """
+    st.session_state.setdefault("_dirty_keys", set()).update(keys)
+
+
+def restore_session():
+    """Attach the browser session to its stored state through ?sid= in the URL.
+
+    Runs once per browser session, on whichever replica it lands on.
+    """
+    if "sid" in st.session_state:
+        # Page switches drop the query string
+        if st.query_params.get("sid") != st.session_state.sid:
+            st.query_params["sid"] = st.session_state.sid
+        return
+
+    sid = st.query_params.get("sid")
+    digests = {}
+    spilled = set()
+    if sid:
+        for key, text in get_session_store().load(sid).items():
+            if not is_persisted(key) or key in st.session_state:
+                continue
+            if key.startswith(tuple(PERSISTED_PREFIXES)):
+                # Left in the store until the page needs it
+                spilled.add(key)
+            else:
+                st.session_state[key] = deserialize(key, text)
+            digests[key] = digest(text)
+    else:
+        # Whoever has the link has the session, so not guessable
+        sid = secrets.token_urlsafe(16)
+        st.query_params["sid"] = sid
+
+    st.session_state.sid = sid
+    st.session_state._state_digests = digests
+    st.session_state._spilled_keys = spilled
+
+
+def save_session():
+    """Write the state keys that changed since the last save"""
+    if "sid" not in st.session_state:
+        return
+    digests = st.session_state._state_digests
+    dirty = st.session_state.setdefault("_dirty_keys", set())
+    changed = {}
+    present = set()
+    for key in list(st.session_state.keys()):
+        if not is_persisted(key):
+            continue
+        present.add(key)
+        if key in digests and key not in dirty and get_codec(key)[0] is not None:
+            continue
+        text = serialize(key, st.session_state[key])
+        text_digest = digest(text)
+        if digests.get(key) != text_digest:
+            changed[key] = text
+            digests[key] = text_digest
+    spilled = st.session_state._spilled_keys
+    spilled -= present  # Written again since it was spilled
+    removed = [key for key in digests if key not in present and key not in spilled]
+    for key in removed:
+        del digests[key]
+    dirty.clear()
+
+    if changed or removed:
+        get_session_store().save(st.session_state.sid, changed, removed)
+
+
+def spill(key: str) -> bool:
+    """Move a persisted key out of memory into the session store.
+
+    Returns False if there is no session to store it in. load_spilled()
+    brings the value back.
+    """
+    if "sid" not in st.session_state or not is_persisted(key):
+        return False
+    text = serialize(key, st.session_state[key])
+    text_digest = digest(text)
+    digests = st.session_state._state_digests
+    if digests.get(key) != text_digest:
+        get_session_store().save(st.session_state.sid, {key: text}, [])
+        digests[key] = text_digest
+    del st.session_state[key]
+    st.session_state._spilled_keys.add(key)
+    return True
+
+
+def load_spilled(key: str) -> bool:
+    """Load a spilled key back into the session state, if it was spilled"""
+    spilled = st.session_state.get("_spilled_keys", set())
+    if key not in spilled:
+        return False
+    spilled.discard(key)
+    text = get_session_store().load_key(st.session_state.sid, key)
+    if text is None:
+        # Expired from the store in the meantime
+        st.session_state._state_digests.pop(key, None)
+        return False
+    st.session_state[key] = deserialize(key, text)
+    return True
+
+
+@contextmanager
+def persisted_session():
+    """Restore the session before a script run and save what changed after it"""
+    restore_session()
+    try:
+        yield
+    finally:
+        save_session()
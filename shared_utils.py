@@ -1,112 +1,271 @@
 # shared_utils.py
+import time
+
 import streamlit as st
 
+from perf import format_ms, percentile, render_perf_panel, section
+
+# Let model_router pick the model per task
+AUTO_MODEL = "auto"
+
+MODELS = [
+    "llama-3.2-90b-text-preview",
+    "llama-3.2-90b-vision-preview",
+    "llama-3.2-11b-text-preview",
+    "llama-3.2-11b-vision-preview",
+    "llama-3.2-1b-preview",
+    "llama-3.2-3b-preview",
+    "llama3-70b-8192",
+    "llama3-8b-8192",
+]
+DEFAULT_MODEL = AUTO_MODEL
+
+# How professions are matched: retrieved from the bundled catalog and
+# personalized by the LLM, retrieved only, or generated by the LLM from scratch
+MATCHING_MODES = ["catalog", "instant", "llm"]
+
+AIKS_CATEGORIES = ["abilities", "interests", "knowledge", "skills"]
+
+
+def get_settings(section: str) -> dict:
+    """Get an optional settings section from .streamlit/secrets.toml"""
+    try:
+        return dict(st.secrets.get(section, {}))
+    except FileNotFoundError:
+        return {}
+
+
+def visible_messages(messages: list, key: str) -> list:
+    """Get the most recent messages to render, with a button to page back.
+
+    Only a window of messages is drawn, so rerun cost doesn't grow with the
+    conversation length.
+    """
+    page_size = get_settings("chat").get("window", 20)
+    window_key = f"window_{key}"
+    window = st.session_state.get(window_key, page_size)
+    hidden = len(messages) - window
+
+    def show_earlier():
+        st.session_state[window_key] = window + page_size
+
+    if hidden > 0:
+        st.button(
+            f"⬆️ Show earlier messages ({hidden} hidden)",
+            key=f"show_earlier_{key}",
+            on_click=show_earlier,
+        )
+        return messages[hidden:]
+    return messages
+
 
 def init_session_state():
     if "model" not in st.session_state:
-        st.session_state.model = "llama-3.2-90b-text-preview"
+        st.session_state.model = DEFAULT_MODEL
 
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
     if "aiks_data" not in st.session_state:
-        st.session_state.aiks_data = {
-            "abilities": [],
-            "interests": [],
-            "knowledge": [],
-            "skills": [],
-        }
+        from aiks_profile import AIKSProfile  # aiks_profile imports this module
+
+        st.session_state.aiks_data = AIKSProfile(
+            max_items=get_settings("profile").get("max_items_per_category", 20)
+        )
     if "assessment_complete" not in st.session_state:
         st.session_state.assessment_complete = False
     if "current_question" not in st.session_state:
         st.session_state.current_question = 0
     if "liked_professions" not in st.session_state:
         st.session_state.liked_professions = {}
+    if "profession_dossiers" not in st.session_state:
+        st.session_state.profession_dossiers = {}
+    if "stream_chat" not in st.session_state:
+        st.session_state.stream_chat = True
+    if "stream_professions" not in st.session_state:
+        st.session_state.stream_professions = True
+    if "matching_mode" not in st.session_state:
+        st.session_state.matching_mode = MATCHING_MODES[0]
+    if "parallel_professions" not in st.session_state:
+        st.session_state.parallel_professions = False
+    if "speculative_prefetch" not in st.session_state:
+        st.session_state.speculative_prefetch = False
 
 
 def render_sidebar():
-    with st.sidebar:
-        # User Profile Section
-        st.title("👤 Your Profile")
-
-        # AIKS Data visualization
-        aiks_data = st.session_state.aiks_data
-
-        # Helper function to create emoji bullets
-        def format_list_items(items):
-            return (
-                "\n".join([f"• {item}" for item in items])
-                if items
-                else "None identified yet"
-            )
+    with section("sidebar"), st.sidebar:
+        render_sidebar_content()
 
-        # Abilities Section
-        with st.expander("Abilities", expanded=True, icon="💪"):
-            if aiks_data["abilities"]:
-                st.markdown(format_list_items(aiks_data["abilities"]))
-            else:
-                st.caption("No abilities identified yet")
-
-        # Interests Section
-        with st.expander("Interests", expanded=True, icon="🌟"):
-            if aiks_data["interests"]:
-                st.markdown(format_list_items(aiks_data["interests"]))
-            else:
-                st.caption("No interests identified yet")
-
-        # Knowledge Section
-        with st.expander("Knowledge", expanded=True, icon="🧠"):
-            if aiks_data["knowledge"]:
-                st.markdown(format_list_items(aiks_data["knowledge"]))
-            else:
-                st.caption("No knowledge areas identified yet")
-
-        # Skills Section
-        with st.expander("Skills", expanded=True, icon="🛠️"):
-            if aiks_data["skills"]:
-                st.markdown(format_list_items(aiks_data["skills"]))
-            else:
-                st.caption("No skills identified yet")
 
-        st.divider()
+@st.fragment
+def render_sidebar_content():
+    """Sidebar content, a fragment so its widgets rerun only the sidebar"""
+    # User Profile Section
+    st.title("👤 Your Profile")
+
+    # AIKS Data visualization
+    aiks_data = st.session_state.aiks_data
+
+    # Helper function to create emoji bullets
+    def format_list_items(items):
+        return (
+            "\n".join([f"• {item}" for item in items])
+            if items
+            else "None identified yet"
+        )
+
+    # Abilities Section
+    with st.expander("Abilities", expanded=True, icon="💪"):
+        if aiks_data["abilities"]:
+            st.markdown(format_list_items(aiks_data["abilities"]))
+        else:
+            st.caption("No abilities identified yet")
+
+    # Interests Section
+    with st.expander("Interests", expanded=True, icon="🌟"):
+        if aiks_data["interests"]:
+            st.markdown(format_list_items(aiks_data["interests"]))
+        else:
+            st.caption("No interests identified yet")
 
-        # Liked Professions Section
-        st.title("💼 Liked Professions")
-        liked_profs = st.session_state.get("liked_professions", {})
-        if liked_profs:
-            for title in liked_profs.keys():
-                st.markdown(f"✨ {title}")
+    # Knowledge Section
+    with st.expander("Knowledge", expanded=True, icon="🧠"):
+        if aiks_data["knowledge"]:
+            st.markdown(format_list_items(aiks_data["knowledge"]))
         else:
-            st.caption("No liked professions yet")
+            st.caption("No knowledge areas identified yet")
+
+    # Skills Section
+    with st.expander("Skills", expanded=True, icon="🛠️"):
+        if aiks_data["skills"]:
+            st.markdown(format_list_items(aiks_data["skills"]))
+        else:
+            st.caption("No skills identified yet")
+
+    st.divider()
+
+    # Liked Professions Section
+    st.title("💼 Liked Professions")
+    liked_profs = st.session_state.get("liked_professions", {})
+    if liked_profs:
+        for title in liked_profs.keys():
+            st.markdown(f"✨ {title}")
+    else:
+        st.caption("No liked professions yet")
+
+    st.divider()
+
+    # Debug Information (collapsed by default)
+    with st.expander("🔧 Debug Information", expanded=False):
+        st.subheader("System Settings")
+
+        # Model selection at the top
+        models = [AUTO_MODEL] + MODELS
+        st.session_state["model"] = st.selectbox(
+            "Choose LLM Model",
+            models,
+            # A restored session may have picked a model no longer offered
+            index=(
+                models.index(st.session_state.model)
+                if st.session_state.model in models
+                else 0
+            ),
+        )
+        st.session_state["matching_mode"] = st.selectbox(
+            "Profession matching mode",
+            MATCHING_MODES,
+            index=MATCHING_MODES.index(st.session_state.matching_mode),
+        )
+        st.session_state["stream_chat"] = st.toggle(
+            "Stream chat answers", value=st.session_state.stream_chat
+        )
+        st.session_state["stream_professions"] = st.toggle(
+            "Stream profession cards", value=st.session_state.stream_professions
+        )
+        st.session_state["parallel_professions"] = st.toggle(
+            "Generate professions in parallel",
+            value=st.session_state.parallel_professions,
+        )
+        st.session_state["speculative_prefetch"] = st.toggle(
+            "Prefetch replies to suggested options",
+            value=st.session_state.speculative_prefetch,
+        )
 
         st.divider()
 
-        # Debug Information (collapsed by default)
-        with st.expander("🔧 Debug Information", expanded=False):
-            st.subheader("System Settings")
-
-            # Model selection at the top
-            st.session_state["model"] = st.selectbox(
-                "Choose LLM Model",
-                [
-                    "llama-3.2-90b-text-preview",
-                    "llama-3.2-90b-vision-preview",
-                    "llama-3.2-11b-text-preview",
-                    "llama-3.2-11b-vision-preview",
-                    "llama-3.2-1b-preview",
-                    "llama-3.2-3b-preview",
-                    "llama3-70b-8192",
-                    "llama3-8b-8192",
-                ],
-                index=0,
+        # Expanders render their content on every run, and these read the
+        # caches, walk the chats and build tables, so only on request
+        if st.checkbox("Show statistics", value=False):
+            st.subheader("Shared Caches")
+            from disk_cache import get_disk_cache  # disk_cache imports this module
+
+            for name in ("professions", "answers"):
+                cache = get_disk_cache(name)
+                st.caption(
+                    f"**{name}**: {len(cache)} entries, "
+                    f"{cache.hits} hits, {cache.misses} misses"
+                )
+
+            st.divider()
+
+            st.subheader("Model Router")
+            from model_router import get_model_router  # imports this module
+
+            router = get_model_router()
+            now = time.monotonic()
+            for model in MODELS:
+                stats = router.stats(model)
+                if not stats.outcomes:
+                    continue
+                state = "🔴 open" if stats.is_open(now) else "🟢 closed"
+                st.caption(
+                    f"**{model}**: p50 {stats.percentile(0.5) or 0:.2f}s, "
+                    f"p95 {stats.percentile(0.95) or 0:.2f}s, "
+                    f"errors {stats.error_rate:.0%}, circuit {state}"
+                )
+
+            st.divider()
+
+            st.subheader("LLM Gateway")
+            # llm_gateway imports this module
+            from llm_gateway import PRIORITY_NAMES, get_llm_gateway
+
+            gateway = get_llm_gateway()
+            st.caption(
+                f"Queue depth {gateway.queued} (max {gateway.max_queued}), "
+                f"{gateway.coalesced} requests shared with one already in flight"
             )
+            for priority, name in PRIORITY_NAMES.items():
+                waits = gateway.wait_times(priority)
+                if waits:
+                    st.caption(
+                        f"**{name}** wait: p50 {format_ms(percentile(waits, 0.5))}, "
+                        f"p95 {format_ms(percentile(waits, 0.95))}, "
+                        f"max {format_ms(max(waits))}"
+                    )
 
             st.divider()
 
-            st.subheader("Session State")
+            st.subheader("Session Memory")
+            from profession_chat import chat_memory_usage  # imports this module
+
+            used, budget = chat_memory_usage()
+            spilled = len(st.session_state.get("_spilled_keys", ()))
+            st.caption(
+                f"Profession chats: {used / 1024:.0f} of {budget / 1024:.0f} KiB, "
+                f"{spilled} profession chats moved to the session store"
+            )
+
+            st.divider()
+
+            render_perf_panel()
+
+        # Dumping the whole state is slow, so only on request
+        if st.checkbox("Show session state", value=False):
             st.json(
                 {
-                    k: v
+                    k: v.to_dict() if k == "aiks_data" else v
                     for k, v in st.session_state.items()
                     if k not in ["liked_professions", "chat_history"]
+                    and not k.startswith("_perf")
                 }
             )
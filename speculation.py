@@ -0,0 +1,80 @@
+# speculation.py
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import streamlit as st
+
+from llm_gateway import background
+from perf import with_trace_attributes
+from shared_utils import get_settings
+
+# Defaults for speculative prefetching, override them in the [speculation]
+# section of .streamlit/secrets.toml
+DEFAULT_SPECULATION_SETTINGS = {
+    "max_workers": 8,
+    "session_budget": 40,
+}
+
+
+def get_speculation_settings() -> dict:
+    return {**DEFAULT_SPECULATION_SETTINGS, **get_settings("speculation")}
+
+
+@st.cache_resource(show_spinner=False)
+def get_prefetch_executor() -> ThreadPoolExecutor:
+    """Get the process-wide thread pool shared by all speculative requests"""
+    return ThreadPoolExecutor(
+        max_workers=get_speculation_settings()["max_workers"],
+        thread_name_prefix="prefetch",
+    )
+
+
+class Prefetcher:
+    """Per-session speculative requests for answers the user is likely to pick.
+
+    Every submitted request counts against the session budget, so a user who
+    never clicks a suggestion can't keep the shared pool busy forever.
+    """
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.submitted = 0
+        self.used = 0
+        self._futures: dict[tuple, Future] = {}
+
+    @property
+    def remaining(self) -> int:
+        return self.budget - self.submitted
+
+    def prefetch(self, key: tuple, fn, *args) -> bool:
+        """Start fn(*args) in the background unless already started or over budget"""
+        if key in self._futures or self.remaining <= 0:
+            return False
+
+        self._futures[key] = get_prefetch_executor().submit(
+            background(with_trace_attributes(fn)), *args
+        )
+        self.submitted += 1
+        return True
+
+    def take(self, key: tuple):
+        """Get the future for key and throw away every other speculation"""
+        future = self._futures.pop(key, None)
+        self.discard()
+        if future is not None:
+            self.used += 1
+        return future
+
+    def discard(self):
+        """Cancel pending speculations, running ones finish and are ignored"""
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+
+
+def get_prefetcher() -> Prefetcher:
+    """Get the prefetcher of the current session"""
+    if "prefetcher" not in st.session_state:
+        st.session_state.prefetcher = Prefetcher(
+            budget=get_speculation_settings()["session_budget"]
+        )
+    return st.session_state.prefetcher
@@ -0,0 +1,57 @@
+# text_similarity.py
+import numpy as np
+
+from aiks_profile import STOP_WORDS, canonicalize
+
+
+def stem(word: str) -> str:
+    """Very light stemming, so "drawing", "draws" and "draw" match"""
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    return [stem(word) for word in canonicalize(text).split() if word not in STOP_WORDS]
+
+
+class TfidfVectorizer:
+    """TF-IDF vectors over a fixed corpus, rows are L2-normalized.
+
+    Dot products of the vectors are cosine similarities, so scoring a query
+    against the whole corpus is a single matrix-vector product.
+    """
+
+    def __init__(self, documents: list[str]):
+        documents_tokens = [tokenize(document) for document in documents]
+        vocabulary = sorted({token for tokens in documents_tokens for token in tokens})
+        self.vocabulary = {token: idx for idx, token in enumerate(vocabulary)}
+
+        document_frequency = np.zeros(len(vocabulary), dtype=np.float32)
+        for tokens in documents_tokens:
+            for token in set(tokens):
+                document_frequency[self.vocabulary[token]] += 1
+
+        n_documents = len(documents)
+        self.idf = (np.log((1 + n_documents) / (1 + document_frequency)) + 1).astype(
+            np.float32
+        )
+        self.matrix = self._vectorize(documents_tokens)
+
+    def _vectorize(self, documents_tokens: list[list[str]]) -> np.ndarray:
+        matrix = np.zeros((len(documents_tokens), len(self.vocabulary)), np.float32)
+        for row, tokens in enumerate(documents_tokens):
+            for token in tokens:
+                idx = self.vocabulary.get(token)
+                if idx is not None:
+                    matrix[row, idx] += 1
+
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-9)
+
+    def transform(self, texts: list[str]) -> np.ndarray:
+        """Vectorize texts, words outside the corpus vocabulary are ignored"""
+        return self._vectorize([tokenize(text) for text in texts])
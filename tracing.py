@@ -0,0 +1,240 @@
+# tracing.py
+import atexit
+import json
+import os
+import queue
+import secrets
+import threading
+
+import streamlit as st
+
+from shared_utils import get_settings
+
+# Defaults for LLM call tracing, override them in the [tracing] section of
+# .streamlit/secrets.toml. Exporter is "none", "jsonl" or "otlp"
+DEFAULT_TRACING_SETTINGS = {
+    "exporter": "none",
+    "path": ".traces/llm_calls.jsonl",
+    "max_bytes": 10_000_000,
+    "backup_count": 3,
+    "endpoint": "http://localhost:4318/v1/traces",
+    "service_name": "talent-tracing",
+    "batch_size": 100,
+    "flush_interval": 5.0,
+    "max_queue": 10_000,
+}
+
+
+def get_tracing_settings() -> dict:
+    return {**DEFAULT_TRACING_SETTINGS, **get_settings("tracing")}
+
+
+def span_from_call(call) -> dict:
+    """Build a span from a finished perf.LLMCall"""
+    start_ns = int(call.timestamp * 1e9)
+    attributes = {
+        "session.id": call.session_id,
+        "talent_tracing.page": call.page,
+        "talent_tracing.task": call.task,
+        "gen_ai.system": "groq",
+        "gen_ai.request.model": call.model,
+        "gen_ai.usage.input_tokens": call.prompt_tokens,
+        "gen_ai.usage.output_tokens": call.completion_tokens,
+        "talent_tracing.response_model": call.response_model,
+        "talent_tracing.retries": call.retries,
+        "talent_tracing.validation_errors": call.validation_errors,
+        "talent_tracing.repairs": ", ".join(sorted(call.repairs)) or None,
+        "talent_tracing.latency_ms": round(call.latency * 1000, 1),
+        "talent_tracing.ttft_ms": round(call.ttft * 1000, 1),
+        "talent_tracing.queue_ms": round(call.queued * 1000, 1),
+    }
+    return {
+        "name": f"llm {call.task}",
+        "trace_id": secrets.token_hex(16),
+        "span_id": secrets.token_hex(8),
+        "start_time_unix_nano": start_ns,
+        "end_time_unix_nano": start_ns + int(call.latency * 1e9),
+        "attributes": {k: v for k, v in attributes.items() if v is not None},
+        "error": call.error,
+    }
+
+
+class JsonlExporter:
+    """Appends spans to a local JSONL file, rotated when it grows too big"""
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def rotate(self):
+        for idx in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{idx}"):
+                os.replace(f"{self.path}.{idx}", f"{self.path}.{idx + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def export(self, spans: list[dict]):
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            self.rotate()
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span, ensure_ascii=False) + "\n")
+
+
+def otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpExporter:
+    """Posts spans to an OTLP/HTTP collector in the JSON encoding"""
+
+    def __init__(self, endpoint: str, service_name: str):
+        import httpx  # Only the OTLP exporter needs it
+
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._client = httpx.Client(timeout=10.0)
+
+    def to_otlp(self, span: dict) -> dict:
+        return {
+            "traceId": span["trace_id"],
+            "spanId": span["span_id"],
+            "name": span["name"],
+            "kind": 3,  # SPAN_KIND_CLIENT
+            "startTimeUnixNano": str(span["start_time_unix_nano"]),
+            "endTimeUnixNano": str(span["end_time_unix_nano"]),
+            "attributes": [
+                {"key": k, "value": otlp_value(v)}
+                for k, v in span["attributes"].items()
+            ],
+            # STATUS_CODE_ERROR or STATUS_CODE_OK
+            "status": (
+                {"code": 2, "message": span["error"]} if span["error"] else {"code": 1}
+            ),
+        }
+
+    def export(self, spans: list[dict]):
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": otlp_value(self.service_name),
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "talent_tracing"},
+                            "spans": [self.to_otlp(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        self._client.post(self.endpoint, json=payload).raise_for_status()
+
+
+class BatchSpanProcessor:
+    """Hands spans to an exporter from a background thread, in batches.
+
+    export() only puts the span on a bounded queue, so tracing never adds
+    latency to a user turn. Spans are dropped when the queue is full or the
+    exporter fails, and counted in dropped.
+    """
+
+    def __init__(
+        self, exporter, batch_size: int, flush_interval: float, max_queue: int
+    ):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.exported = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="span-exporter", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def export(self, span: dict):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _next_batch(self) -> list[dict]:
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        while not (self._stopped.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self.exporter.export(batch)
+                self.exported += len(batch)
+            except Exception:
+                self.dropped += len(batch)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Flush what is queued, called at interpreter exit"""
+        self._stopped.set()
+        self._thread.join(timeout)
+
+
+class NoopSpanProcessor:
+    exported = 0
+    dropped = 0
+
+    def export(self, span: dict):
+        pass
+
+
+@st.cache_resource(show_spinner=False)
+def get_span_processor():
+    """Get the process-wide span processor for the configured exporter"""
+    settings = get_tracing_settings()
+    if settings["exporter"] == "jsonl":
+        exporter = JsonlExporter(
+            settings["path"], settings["max_bytes"], settings["backup_count"]
+        )
+    elif settings["exporter"] == "otlp":
+        exporter = OtlpExporter(settings["endpoint"], settings["service_name"])
+    else:
+        return NoopSpanProcessor()
+    return BatchSpanProcessor(
+        exporter,
+        batch_size=settings["batch_size"],
+        flush_interval=settings["flush_interval"],
+        max_queue=settings["max_queue"],
+    )
+
+
+def export_call(call):
+    """Queue a span for a finished LLM call, returns right away"""
+    processor = get_span_processor()
+    if not isinstance(processor, NoopSpanProcessor):
+        processor.export(span_from_call(call))